@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, 'results.json')
+OPERATIONS = ('hash', 'split', 'split-size', 'join')
+
+def read_proc_io():
+    # Счетчики ввода-вывода процесса (только Linux): число системных вызовов read/write
+    # и объем переданных через них данных.
+    try:
+        with open('/proc/self/io', 'r') as f_io:
+            return {key: int(value) for key, value in (line.split(': ') for line in f_io)}
+    except OSError:
+        return None
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def make_source(path, size, data):
+    # sparse — файл из дыр (проверяет накладные расходы программы, а не диска),
+    # random — случайные данные, записанные на диск.
+    with open(path, 'wb') as f_out:
+        if data == 'sparse':
+            f_out.truncate(size)
+            return
+        block = 4 * 1024 * 1024
+        written = 0
+        while written < size:
+            n = min(block, size - written)
+            f_out.write(os.urandom(n))
+            written += n
+
+def run_case(case):
+    # Выполняется в отдельном процессе, чтобы пиковая память относилась к одному замеру.
+    workdir = case['workdir']
+    source = os.path.join(workdir, f"case{os.path.splitext(case['source'])[1]}")
+    os.link(case['source'], source)
+    base_name = os.path.splitext(source)[0]
+    parts_folder = f"{base_name}_parts"
+    size, parts, buffer_size = case['size'], case['parts'], case['buffer']
+    part_size = max(1, -(-size // parts))
+
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            if case['op'] == 'join':
+                main.split_file(source, str(parts), buffer_size=buffer_size, raise_errors=True)
+            io_before = read_proc_io()
+            started = time.perf_counter()
+            if case['op'] == 'hash':
+                main.calculate_file_hash(source, 'sha256', buffer_size)
+            elif case['op'] == 'split':
+                main.split_file(source, str(parts), buffer_size=buffer_size, raise_errors=True)
+            elif case['op'] == 'split-size':
+                main.split_by_size(source, f"{part_size}B", buffer_size=buffer_size, raise_errors=True)
+            else:
+                main.join_files(parts_folder, os.path.join(workdir, 'joined.bin'), buffer_size=buffer_size,
+                                cleanup=False, raise_errors=True)
+            elapsed = time.perf_counter() - started
+            io_after = read_proc_io()
+        finally:
+            sys.stdout = stdout
+
+    result = {key: case[key] for key in ('op', 'data', 'size', 'parts', 'buffer')}
+    result['seconds'] = elapsed
+    result['mb_s'] = size / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+    result['peak_rss_kb'] = peak_rss_kb()
+    if io_before is not None and io_after is not None:
+        result['syscalls'] = {'read': io_after['syscr'] - io_before['syscr'],
+                              'write': io_after['syscw'] - io_before['syscw']}
+        result['bytes'] = {'read': io_after['rchar'] - io_before['rchar'],
+                           'write': io_after['wchar'] - io_before['wchar']}
+    return result
+
+def case_key(result):
+    return f"{result['op']}/{result['data']}/{result['size']}/{result['parts']}/{result['buffer']}"
+
+def run_suite(args):
+    tmp_root = tempfile.mkdtemp(prefix='db-divider-bench-', dir=args.tmpdir)
+    results = []
+    try:
+        for data in args.data:
+            for size in args.sizes:
+                source = os.path.join(tmp_root, f"source_{data}_{size}.bin")
+                make_source(source, size, data)
+                for op in args.ops:
+                    for parts in (args.parts if op != 'hash' else [1]):
+                        for buffer_size in args.buffers:
+                            runs = []
+                            for _ in range(args.repeat):
+                                workdir = tempfile.mkdtemp(dir=tmp_root)
+                                case = {'op': op, 'data': data, 'size': size, 'parts': parts, 'buffer': buffer_size,
+                                        'source': source, 'workdir': workdir}
+                                completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--case',
+                                                            json.dumps(case)], capture_output=True, text=True)
+                                shutil.rmtree(workdir, ignore_errors=True)
+                                if completed.returncode != 0:
+                                    raise RuntimeError(f"Замер {op} завершился с ошибкой:\n{completed.stderr}")
+                                runs.append(json.loads(completed.stdout.splitlines()[-1]))
+                            best = min(runs, key=lambda r: r['seconds'])
+                            best['peak_rss_kb'] = max((r['peak_rss_kb'] or 0) for r in runs) or None
+                            results.append(best)
+                            print(f"{case_key(best):45} {best['mb_s']:9.1f} MB/s  "
+                                  f"RSS {best['peak_rss_kb'] or 0:>7} KB  "
+                                  f"syscalls {best.get('syscalls', {}).get('read', '-')}/"
+                                  f"{best.get('syscalls', {}).get('write', '-')}")
+                os.remove(source)
+    finally:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+    return results
+
+def compare(results, baseline, threshold):
+    # Регрессия — скорость ниже базовой больше чем на threshold или пиковая память
+    # выше базовой больше чем на threshold.
+    reference = {case_key(r): r for r in baseline['results']}
+    regressions = []
+    print(f"\nСравнение с базовыми результатами от {baseline['meta'].get('date', '?')}:")
+    for result in results:
+        base = reference.get(case_key(result))
+        if base is None:
+            print(f"  {case_key(result):45} новый замер")
+            continue
+        speed_delta = result['mb_s'] / base['mb_s'] - 1 if base['mb_s'] else 0.0
+        rss_delta = (result['peak_rss_kb'] / base['peak_rss_kb'] - 1
+                     if result.get('peak_rss_kb') and base.get('peak_rss_kb') else 0.0)
+        regressed = speed_delta < -threshold or rss_delta > threshold
+        marker = 'РЕГРЕССИЯ' if regressed else 'ok'
+        print(f"  {case_key(result):45} скорость {speed_delta:+7.1%}  память {rss_delta:+7.1%}  {marker}")
+        if regressed:
+            regressions.append(case_key(result))
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Замеры скорости разделения, объединения и хеширования")
+    parser.add_argument('--sizes', default='64MB,256MB', help="размеры файлов через запятую")
+    parser.add_argument('--parts', default='4,16', help="количество частей через запятую")
+    parser.add_argument('--buffers', default='64KB,1MB,8MB', help="размеры буфера через запятую")
+    parser.add_argument('--ops', default=','.join(OPERATIONS), help="операции: hash, split, split-size, join")
+    parser.add_argument('--data', default='random', help="тип данных: random, sparse (через запятую)")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов каждого замера (берется лучший)")
+    parser.add_argument('--tmpdir', default=None, help="папка для временных файлов")
+    parser.add_argument('--output', default=DEFAULT_RESULTS, help="куда записать результаты JSON")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="базовые результаты для сравнения")
+    parser.add_argument('--save-baseline', action='store_true', help="сохранить результаты как базовые")
+    parser.add_argument('--threshold', type=float, default=0.10, help="допустимое ухудшение (0.10 = 10%%)")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+
+    args.sizes = [main.parse_size(s) for s in args.sizes.split(',')]
+    args.parts = [int(p) for p in args.parts.split(',')]
+    args.buffers = [main.parse_size(b) for b in args.buffers.split(',')]
+    args.ops = [op for op in args.ops.split(',') if op]
+    args.data = [d for d in args.data.split(',') if d]
+    unknown = [op for op in args.ops if op not in OPERATIONS] + [d for d in args.data if d not in ('random', 'sparse')]
+    if unknown:
+        parser.error(f"неизвестные значения: {', '.join(unknown)}")
+
+    results = run_suite(args)
+    report = {
+        'meta': {'date': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f_out:
+        json.dump(report, f_out, ensure_ascii=False, indent=1)
+    print(f"\nРезультаты записаны в '{args.output}'")
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Базовые результаты сохранены в '{args.baseline}'")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f_base:
+            regressions = compare(results, json.load(f_base), args.threshold)
+        if regressions:
+            print(f"\nНайдено регрессий: {len(regressions)}")
+            return 1
+    else:
+        print(f"Базовые результаты '{args.baseline}' не найдены; сохраните их с --save-baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
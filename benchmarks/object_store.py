@@ -0,0 +1,137 @@
+import os
+import sys
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from urllib.parse import unquote, urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Локальная замена S3-совместимого хранилища для проверки --upload и --download:
+# PUT сохраняет объект в папку (с проверкой x-amz-checksum-sha256), GET отдает его.
+# --fail-rate отвечает 503 на часть запросов, чтобы проверить повторы.
+
+BLOCK_SIZE = 1024 * 1024
+
+class ObjectStoreHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def object_path(self):
+        key = unquote(urlsplit(self.path).path).lstrip('/')
+        names = key.split('/')
+        if not key or any(name in ('', '.', '..') for name in names):
+            return None
+        return os.path.join(self.server.root, *names)
+
+    def reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def injected_failure(self):
+        return self.server.fail_rate and random.random() < self.server.fail_rate
+
+    def do_PUT(self):
+        with self.server.lock:
+            self.server.stats['requests'] += 1
+        path = self.object_path()
+        length = int(self.headers.get('Content-Length', 0))
+        if path is None:
+            self.rfile.read(length)
+            return self.reply(400, b'InvalidKey')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.upload{threading.get_ident()}"
+        digest = hashlib.sha256()
+        with open(tmp_path, 'wb') as f_out:
+            remaining = length
+            while remaining:
+                data = self.rfile.read(min(BLOCK_SIZE, remaining))
+                if not data:
+                    break
+                digest.update(data)
+                f_out.write(data)
+                remaining -= len(data)
+        if self.injected_failure():
+            os.remove(tmp_path)
+            return self.reply(503, b'SlowDown')
+        expected = self.headers.get('x-amz-checksum-sha256')
+        if expected and base64.b64decode(expected) != digest.digest():
+            os.remove(tmp_path)
+            return self.reply(400, b'BadDigest')
+        os.replace(tmp_path, path)
+        with self.server.lock:
+            self.server.stats['bytes_in'] += length
+        self.reply(200, headers={'ETag': f'"{digest.hexdigest()}"'})
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.stats['requests'] += 1
+        path = self.object_path()
+        if path is None or not os.path.isfile(path):
+            return self.reply(404, b'NoSuchKey')
+        if self.injected_failure():
+            return self.reply(503, b'SlowDown')
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        with open(path, 'rb') as f_in:
+            for data in iter(lambda: f_in.read(BLOCK_SIZE), b''):
+                self.wfile.write(data)
+        with self.server.lock:
+            self.server.stats['bytes_out'] += size
+
+    do_HEAD = do_GET
+
+def make_server(root, host='127.0.0.1', port=0, fail_rate=0.0, verbose=False):
+    server = ThreadingHTTPServer((host, port), ObjectStoreHandler)
+    server.daemon_threads = True
+    server.root = root
+    server.fail_rate = fail_rate
+    server.verbose = verbose
+    server.lock = threading.Lock()
+    server.stats = {'connections': 0, 'requests': 0, 'bytes_in': 0, 'bytes_out': 0}
+    return server
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Локальное хранилище объектов для проверки --upload и --download")
+    parser.add_argument('--root', required=True, help="папка для объектов")
+    parser.add_argument('--host', default='127.0.0.1', help="адрес для прослушивания")
+    parser.add_argument('--port', type=int, default=8080, help="порт (0 — любой свободный)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="доля запросов с ответом 503 (0.1 = 10%%)")
+    parser.add_argument('--verbose', action='store_true', help="печатать каждый запрос")
+    args = parser.parse_args()
+
+    os.makedirs(args.root, exist_ok=True)
+    server = make_server(args.root, args.host, args.port, args.fail_rate, args.verbose)
+    print(f"Хранилище слушает http://{args.host}:{server.server_address[1]}/ , объекты в '{args.root}'", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.stats
+        print(f"\nСоединений: {stats['connections']}, запросов: {stats['requests']}, "
+              f"принято {stats['bytes_in']} байт, отдано {stats['bytes_out']} байт")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
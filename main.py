@@ -1,10 +1,65 @@
 import os
+import re
 import sys
-import hashlib
+import json
+import io
+import errno
 import math
-import shutil
+import bisect
+import contextlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+MIN_BUFFER_SIZE = 64 * 1024
+MAX_BUFFER_SIZE = 64 * 1024 * 1024
+TREE_LEAF_SIZE = 4 * 1024 * 1024
+TREE_MIN_LEAF_SIZE = 64 * 1024
+KERNEL_COPY_CHUNK = 1024 ** 3
+
+MANIFEST_NAME = "!split_manifest.json"
+MANIFEST_FORMAT = "db-divider-split"
+MANIFEST_VERSION = 2
+SPLIT_JOURNAL_NAME = "!split_journal.jsonl"
+JOIN_JOURNAL_NAME = "!join_journal.jsonl"
+
+CDC_DEFAULT_AVG = 1024 * 1024
+CDC_SCAN_BLOCK = 1024 * 1024
+CDC_NP_BLOCK = 64 * 1024
+CDC_DEFAULT_STORE = "chunk_store"
+
+COMPRESSION_SUFFIXES = {'zlib': '.gz', 'lzma': '.xz', 'bz2': '.bz2'}
+COMPRESSION_LEVELS = {'zlib': range(0, 10), 'lzma': range(0, 10), 'bz2': range(1, 10)}
+
+PARTS_READER_MAX_OPEN = 64
+
+BATCH_LOG_TAIL = 20
+
+BROWSER_PAGE_SIZE = 20
+
+DIR_INDEX_NAME = "!split_index.json"
+DIR_INDEX_FORMAT = "db-divider-dir-index"
+DIR_INDEX_VERSION = 1
+DIR_VOLUME_EXTENSION = ".vol"
+DIR_RESTORE_MAX_OPEN = 8
+
+PROGRESS_INTERVAL = 1.0
+
+TRANSFER_CONNECTIONS = 4
+TRANSFER_RETRIES = 3
+TRANSFER_BACKOFF = 0.5
+TRANSFER_TIMEOUT = 60
+
+PARITY_SCHEME = 'rs-cauchy-gf256'
+PARITY_MAX_K = 128
+
+ZERO_COPY_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+    errno.EPERM, getattr(errno, 'EOPNOTSUPP', errno.EINVAL),
+}
+
 class Colors:
     HEADER = '\033[95m'
     OKBLUE = '\033[94m'
@@ -55,6 +110,8 @@ CAT_ARTS = [
 ]
 
 def play_sound(sound_type):
+    if QUIET:
+        return
     try:
         if sound_type == "select":
             print("\a", end="", flush=True)
@@ -68,22 +125,162 @@ def play_sound(sound_type):
         pass
 
 def get_random_cat_art():
+    if QUIET:
+        return ""
     import random
     return random.choice(CAT_ARTS)
 
-def calculate_file_hash(filename, algorithm='md5'):
-    hash_func = getattr(hashlib, algorithm)()
+QUIET = False
+
+def set_quiet():
+    # Режим для systemd и журналов: без ANSI-цветов, котиков и звуковых сигналов.
+    global QUIET
+    QUIET = True
+    for name in ('HEADER', 'OKBLUE', 'OKCYAN', 'OKGREEN', 'WARNING', 'FAIL', 'ENDC', 'BOLD', 'UNDERLINE'):
+        setattr(Colors, name, '')
+
+class Operation:
+    def __init__(self, name, total=None, interval=PROGRESS_INTERVAL):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self.interval = interval
+        self.next_emit = self.started + interval
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def snapshot(self, event, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        speed = self.done / elapsed if elapsed > 0 else 0.0
+        record = {'event': event, 'op': self.name, 'done': self.done, 'total': self.total,
+                  'elapsed': round(elapsed, 3), 'mb_s': round(speed / 1024 ** 2, 2)}
+        if self.total:
+            record['percent'] = round(min(100.0, self.done * 100 / self.total), 1)
+            if event == 'progress':
+                record['eta'] = round(max(0, self.total - self.done) / speed, 1) if speed > 0 else None
+        return record
+
+class Progress:
+    # События хода работы для split, hash и join: начало, периодический прогресс
+    # (байты, MB/s, ETA) и завершение со временем стадий чтения, хеширования и записи.
+    # Пока нет подписчиков и не включены замеры стадий, операции не создаются, и
+    # цикл копирования платит только за одну проверку на буфер.
+    def __init__(self):
+        self.callbacks = []
+        self.timing = False
+        self.interval = PROGRESS_INTERVAL
+        self.local = threading.local()
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self.callbacks.remove(callback)
+
+    def emit(self, record):
+        for callback in list(self.callbacks):
+            callback(record)
+
+    def current(self):
+        stack = getattr(self.local, 'stack', None)
+        return stack[-1] if stack else None
+
+    @contextlib.contextmanager
+    def operation(self, name, total=None):
+        if not self.callbacks and not self.timing:
+            yield None
+            return
+        op = Operation(name, total, self.interval)
+        if getattr(self.local, 'stack', None) is None:
+            self.local.stack = []
+        stack = self.local.stack
+        stack.append(op)
+        self.emit({'event': 'start', 'op': name, 'total': total})
+        ok = False
+        try:
+            yield op
+            ok = True
+        finally:
+            stack.remove(op)
+            record = op.snapshot('finish')
+            record['ok'] = ok
+            if op.stages:
+                record['stages'] = {stage: round(seconds, 4) for stage, seconds in op.stages.items()}
+            self.emit(record)
+
+    def advance(self, n):
+        stack = getattr(self.local, 'stack', None)
+        if not stack:
+            return
+        op = stack[-1]
+        with op.lock:
+            op.done += n
+            now = time.perf_counter()
+            if now < op.next_emit:
+                return
+            op.next_emit = now + op.interval
+            record = op.snapshot('progress', now)
+        self.emit(record)
+
+    def add_stages(self, **stages):
+        op = self.current()
+        if op is None:
+            return
+        with op.lock:
+            for stage, seconds in stages.items():
+                op.stages[stage] = op.stages.get(stage, 0.0) + seconds
+
+    def bind(self, func):
+        # Потоки пула не видят операцию вызывающего потока, поэтому она передается явно.
+        stack = getattr(self.local, 'stack', None)
+        if not stack:
+            return func
+        stack = list(stack)
+
+        def bound(*args, **kwargs):
+            previous = getattr(self.local, 'stack', None)
+            self.local.stack = list(stack)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.local.stack = previous
+        return bound
+
+PROGRESS = Progress()
+
+def json_progress_writer(stream):
+    def write(record):
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        stream.flush()
+    return write
+
+def print_profile(record):
+    if record['event'] != 'finish':
+        return
+    print(f"{Colors.OKCYAN}Профиль '{record['op']}':{Colors.ENDC} {format_file_size(record['done'])} "
+          f"за {record['elapsed']:.2f} с ({record['mb_s']:.1f} MB/s)")
+    labels = {'read': 'чтение', 'hash': 'хеширование', 'write': 'запись', 'copy': 'копирование ядром'}
+    for stage, seconds in sorted(record.get('stages', {}).items(), key=lambda item: -item[1]):
+        share = seconds * 100 / record['elapsed'] if record['elapsed'] > 0 else 0.0
+        print(f"  {labels.get(stage, stage):20} {seconds:8.3f} с  {share:5.1f}%")
+
+def calculate_file_hash(filename, algorithm='md5', buffer_size=None, jobs=1):
     try:
-        with open(filename, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_func.update(chunk)
-        return hash_func.hexdigest()
+        with PROGRESS.operation('hash', os.path.getsize(filename)):
+            if is_tree_algorithm(algorithm) and jobs > 1:
+                return tree_hash_file(filename, algorithm, buffer_size, jobs)
+            hash_func = new_hasher(algorithm)
+            view = memoryview(allocate_buffer(buffer_size))
+            with open(filename, "rb") as f:
+                hash_range(f, 0, None, [hash_func], view, track=True)
+            return hash_func.hexdigest()
     except Exception as e:
         print(f"{Colors.FAIL}Ошибка при вычислении хеша: {e}{Colors.ENDC}")
         return None
 
-def verify_file_integrity(original_hash, filename, algorithm='md5'):
-    current_hash = calculate_file_hash(filename, algorithm)
+def verify_file_integrity(original_hash, filename, algorithm='md5', jobs=1):
+    current_hash = calculate_file_hash(filename, algorithm, jobs=jobs)
     if current_hash == original_hash:
         print(f"{Colors.OKGREEN}✓ Проверка целостности пройдена успешно!{Colors.ENDC}")
         return True
@@ -108,8 +305,19 @@ def ask_yes_no(question, default=True):
         return default
     return answer in ["y", "yes", "д", "да"]
 
+class SplitterError(Exception):
+    pass
+
+def report_error(message):
+    # Сообщение об ошибке для пользователя; возвращает исключение, чтобы вызывающий код
+    # мог его поднять (библиотечный режим, --batch) или просто завершить работу.
+    print(f"{Colors.FAIL}{message}{Colors.ENDC}")
+    play_sound("error")
+    return SplitterError(message.strip())
+
 def safe_move_file(src, dst):
     try:
+        import shutil
         shutil.move(src, dst)
         print(f"{Colors.OKGREEN}Файл '{os.path.basename(src)}' перемещен в '{dst}'.{Colors.ENDC}")
         return True
@@ -117,21 +325,1246 @@ def safe_move_file(src, dst):
         print(f"{Colors.FAIL}Ошибка при перемещении файла '{src}': {e}{Colors.ENDC}")
         return False
 
-def split_file(input_filename, num_parts_str):
+def parse_size(size_str):
+    size_units = {'B': 1, 'KB': 1024, 'MB': 1024**2, 'GB': 1024**3, 'TB': 1024**4}
+    size_str = str(size_str).upper().replace(' ', '')
+
+    unit = ''.join(filter(str.isalpha, size_str))
+    value = ''.join(filter(str.isdigit, size_str))
+
+    if not value:
+        raise ValueError("Не указан размер части")
+    if unit and unit not in size_units:
+        raise ValueError(f"Неизвестная единица измерения: '{unit}'")
+
+    return int(value) * size_units.get(unit, 1)
+
+def allocate_buffer(buffer_size=None):
+    if buffer_size is None:
+        buffer_size = DEFAULT_BUFFER_SIZE
+    buffer_size = max(MIN_BUFFER_SIZE, min(int(buffer_size), MAX_BUFFER_SIZE))
+    return bytearray(buffer_size)
+
+def _kernel_copy(fd_in, fd_out, offset, out_offset, length):
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < length:
+                n = os.copy_file_range(fd_in, fd_out, min(length - copied, KERNEL_COPY_CHUNK),
+                                       offset + copied, out_offset + copied)
+                if n == 0:
+                    break
+                copied += n
+            return copied
+        except OSError as e:
+            if e.errno not in ZERO_COPY_FALLBACK_ERRNOS:
+                raise
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            os.lseek(fd_out, out_offset + copied, os.SEEK_SET)
+            while copied < length:
+                n = os.sendfile(fd_out, fd_in, offset + copied, min(length - copied, KERNEL_COPY_CHUNK))
+                if n == 0:
+                    break
+                copied += n
+        except OSError as e:
+            if e.errno not in ZERO_COPY_FALLBACK_ERRNOS:
+                raise
+    return copied
+
+def copy_range(f_in, f_out, offset, length, out_offset=0, buffer=None, hashers=(), zero_copy=True):
+    # Данные идут через ядро (copy_file_range/sendfile), если их не нужно хешировать,
+    # иначе — через один переиспользуемый буфер фиксированного размера.
+    copied = 0
+    clock = time.perf_counter if PROGRESS.timing else None
+    if zero_copy and not hashers and length > 0:
+        f_out.flush()
+        t0 = clock and clock()
+        copied = _kernel_copy(f_in.fileno(), f_out.fileno(), offset, out_offset, length)
+        if clock:
+            PROGRESS.add_stages(copy=clock() - t0)
+        PROGRESS.advance(copied)
+
+    if copied < length:
+        if buffer is None:
+            buffer = allocate_buffer()
+        view = memoryview(buffer)
+        f_in.seek(offset + copied)
+        f_out.seek(out_offset + copied)
+        while copied < length:
+            t0 = clock and clock()
+            n = f_in.readinto(view[:min(len(view), length - copied)])
+            if not n:
+                raise EOFError(f"Неожиданный конец файла '{f_in.name}' на смещении {offset + copied}")
+            chunk = view[:n]
+            t1 = clock and clock()
+            for hash_func in hashers:
+                hash_func.update(chunk)
+            t2 = clock and clock()
+            f_out.write(chunk)
+            if clock:
+                PROGRESS.add_stages(read=t1 - t0, hash=t2 - t1, write=clock() - t2)
+            PROGRESS.advance(n)
+            copied += n
+    return copied
+
+def hash_range(f_in, offset, length, hashers, buffer, track=False):
+    # length=None — до конца файла. track=True учитывает прочитанное в ходе текущей операции.
+    view = memoryview(buffer)
+    f_in.seek(offset)
+    clock = time.perf_counter if track and PROGRESS.timing else None
+    done = 0
+    while length is None or done < length:
+        t0 = clock and clock()
+        n = f_in.readinto(view if length is None else view[:min(len(view), length - done)])
+        if not n:
+            if length is None:
+                break
+            raise EOFError(f"Неожиданный конец файла '{f_in.name}' на смещении {offset + done}")
+        t1 = clock and clock()
+        for hash_func in hashers:
+            hash_func.update(view[:n])
+        if clock:
+            PROGRESS.add_stages(read=t1 - t0, hash=clock() - t1)
+        if track:
+            PROGRESS.advance(n)
+        done += n
+
+class TreeHasher:
+    # Дерево Меркла над блоками фиксированного размера: лист = H(0x00 || блок),
+    # узел = H(0x01 || левый || правый). Листья не зависят друг от друга, поэтому
+    # их можно считать параллельно, а хеш части — собрать из ее же листьев.
+    def __init__(self, name='blake2b', leaf_size=None):
+        self.name = name
+        self.leaf_size = leaf_size or TREE_LEAF_SIZE
+        self.leaves = []
+        self._leaf = None
+        self._filled = 0
+
+    def _new_leaf(self):
+        import hashlib
+        leaf = hashlib.new(self.name)
+        leaf.update(b'\x00')
+        return leaf
+
+    def update(self, data):
+        view = memoryview(data).cast('B')
+        while len(view):
+            if self._leaf is None:
+                self._leaf = self._new_leaf()
+            take = min(len(view), self.leaf_size - self._filled)
+            self._leaf.update(view[:take])
+            self._filled += take
+            view = view[take:]
+            if self._filled == self.leaf_size:
+                self.leaves.append(self._leaf.digest())
+                self._leaf = None
+                self._filled = 0
+
+    def add_leaves(self, leaves_hex):
+        if self._leaf is not None:
+            raise ValueError("Листья можно добавлять только на границе блока")
+        self.leaves.extend(bytes.fromhex(leaf) for leaf in leaves_hex)
+
+    def all_leaves(self):
+        if self._leaf is not None:
+            return self.leaves + [self._leaf.copy().digest()]
+        return list(self.leaves)
+
+    def leaves_hex(self):
+        return [leaf.hex() for leaf in self.all_leaves()]
+
+    def hexdigest(self):
+        return merkle_root(self.all_leaves(), self.name)
+
+def merkle_root(leaves, name='blake2b'):
+    import hashlib
+    level = leaves
+    if not level:
+        empty = hashlib.new(name)
+        empty.update(b'\x00')
+        level = [empty.digest()]
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level) - 1, 2):
+            node = hashlib.new(name)
+            node.update(b'\x01' + level[i] + level[i + 1])
+            next_level.append(node.digest())
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0].hex()
+
+def parse_hash_algorithm(algorithm):
+    name, _, leaf_size = algorithm.partition(':')
+    if name.startswith('tree-'):
+        return name[5:], int(leaf_size) if leaf_size else TREE_LEAF_SIZE
+    return name, None
+
+def is_tree_algorithm(algorithm):
+    return bool(algorithm) and algorithm.startswith('tree-')
+
+def new_hasher(algorithm):
+    import hashlib
+    name, leaf_size = parse_hash_algorithm(algorithm)
+    if leaf_size is not None:
+        return TreeHasher(name, leaf_size)
+    return hashlib.new(name)
+
+def hash_algorithm_label(algorithm):
+    name, leaf_size = parse_hash_algorithm(algorithm)
+    if leaf_size is not None:
+        return f"дерево {name.upper()}, блок {format_file_size(leaf_size)}"
+    return name.upper().replace('SHA', 'SHA-')
+
+def tree_leaf_size_for_part(part_size, leaf_size=None):
+    leaf_size = leaf_size or TREE_LEAF_SIZE
+    if part_size <= leaf_size:
+        return part_size
+    for count in range(math.ceil(part_size / leaf_size), part_size // TREE_MIN_LEAF_SIZE + 1):
+        if part_size % count == 0:
+            return part_size // count
+    raise ValueError(f"Размер части {part_size} байт нельзя разбить на одинаковые блоки дерева хешей; "
+                     f"выберите размер, кратный {format_file_size(TREE_MIN_LEAF_SIZE)}")
+
+def tree_hash_file(filename, algorithm, buffer_size=None, jobs=1):
+    from concurrent.futures import ThreadPoolExecutor
+
+    name, leaf_size = parse_hash_algorithm(algorithm)
+    file_size = os.path.getsize(filename)
+    leaf_count = math.ceil(file_size / leaf_size)
+    batch = max(1, (buffer_size or DEFAULT_BUFFER_SIZE) * 16 // leaf_size)
+    local = threading.local()
+
+    def hash_leaves(first):
+        if not hasattr(local, 'buffer'):
+            local.buffer = allocate_buffer(min(leaf_size, MAX_BUFFER_SIZE))
+        digests = []
+        with open(filename, 'rb') as f_in:
+            for leaf in range(first, min(first + batch, leaf_count)):
+                offset = leaf * leaf_size
+                tree = TreeHasher(name, leaf_size)
+                hash_range(f_in, offset, min(leaf_size, file_size - offset), [tree], local.buffer, track=True)
+                digests.extend(tree.all_leaves())
+        return digests
+
+    leaves = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for digests in pool.map(PROGRESS.bind(hash_leaves), range(0, leaf_count, batch)):
+            leaves.extend(digests)
+    return merkle_root(leaves, name)
+
+def fsync_directory(path):
+    # Без fsync папки новая запись в ней (часть, журнал) может пропасть при отключении
+    # питания, даже если данные самого файла уже на диске. В Windows папку так не открыть.
+    if os.name == 'nt':
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
     try:
-        num_parts = int(num_parts_str)
-        if num_parts <= 0:
-            print(f"{Colors.FAIL}\nОшибка: Количество частей должно быть больше нуля.{Colors.ENDC}")
-            play_sound("error")
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.f = None
+        self.records = []
+
+    def load(self):
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        return records
+
+    def start(self, records):
+        # Журнал переписывается целиком во временный файл и подменяется атомарно:
+        # сбой посреди перезаписи не должен стереть записи прерванной операции,
+        # а оборванная последняя строка — склеиться со следующей.
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f_tmp:
+            for record in records:
+                f_tmp.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f_tmp.flush()
+            os.fsync(f_tmp.fileno())
+        os.replace(tmp_path, self.path)
+        fsync_directory(os.path.dirname(self.path))
+        self.f = open(self.path, 'a', encoding='utf-8')
+        self.records = list(records)
+
+    def append(self, record):
+        with self.lock:
+            self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.f.flush()
+            os.fsync(self.f.fileno())
+
+    def close(self, remove=False):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+def load_journal(folder, name, header, resume=False):
+    # Журнал прерванной операции с --consume — единственная запись о том, какие данные уже
+    # вырезаны или удалены, поэтому при несовпадении параметров он не перезаписывается.
+    path = os.path.join(folder, name)
+    records = Journal(path).load()
+    if records and records[0].get('consume') and (not resume or records[0] != header):
+        if not resume:
+            raise report_error(f"Журнал '{path}' остался от прерванной операции с --consume. "
+                               f"Продолжите ее с --resume и теми же параметрами.")
+        raise report_error(f"Журнал '{path}' относится к прерванной операции с --consume и другими "
+                           f"параметрами. Продолжите ее с --resume и теми же параметрами.")
+    if not resume:
+        return []
+    if records and records[0] != header:
+        print(f"{Colors.WARNING}Журнал '{path}' относится к другой операции, начинаем заново.{Colors.ENDC}")
+        return []
+    if not records:
+        print(f"{Colors.WARNING}Журнал для продолжения не найден, начинаем заново.{Colors.ENDC}")
+    return records
+
+def open_journal(folder, name, header, resume=False):
+    records = load_journal(folder, name, header, resume)
+    journal = Journal(os.path.join(folder, name))
+    journal.start(records or [header])
+    return journal, {r['index']: r for r in records[1:] if r.get('event') == 'part'}
+
+def join_journal_header(output_filename, sources, consume=False):
+    header = {'event': 'start', 'op': 'join', 'output': os.path.abspath(output_filename),
+              'size': sum(s['length'] for s in sources), 'parts': len(sources)}
+    if consume:
+        header['consume'] = True
+    return header
+
+def check_part_file(part_path, length, digest=None, algorithm='sha256', verify=False, buffer=None):
+    try:
+        if os.path.getsize(part_path) != length:
+            return False
+    except OSError:
+        return False
+    if verify and digest and algorithm:
+        part_hash = new_hasher(algorithm)
+        with open(part_path, 'rb') as f_part:
+            hash_range(f_part, 0, length, [part_hash], buffer if buffer is not None else allocate_buffer())
+        return part_hash.hexdigest() == digest
+    return True
+
+def resume_split_parts(output_folder_name, records, ranges, algorithm, verify, buffer_size=None):
+    done = {}
+    buffer = allocate_buffer(buffer_size) if verify else None
+    for index, offset, length in ranges:
+        record = records.get(index)
+        if record is None or record['offset'] != offset or record['length'] != length:
+            continue
+        part_path = os.path.join(output_folder_name, record['name'])
+        stored_digest = record.get('stored_digest') or record.get('digest')
+        if check_part_file(part_path, record.get('stored_length', length), stored_digest, algorithm, verify, buffer):
+            done[index] = {k: v for k, v in record.items() if k != 'event'}
+    if done:
+        print(f"{Colors.OKGREEN}Продолжаем: {len(done)} из {len(ranges)} частей уже готовы.{Colors.ENDC}")
+    return done
+
+def check_compression(codec, level=None):
+    # Проверяется до перемещения исходного файла: ошибка уровня внутри копирования
+    # оставила бы недописанную часть.
+    if codec is None:
+        return
+    if codec not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Алгоритм сжатия должен быть одним из: {', '.join(COMPRESSION_SUFFIXES)}")
+    levels = COMPRESSION_LEVELS[codec]
+    if level is not None and level not in levels:
+        raise ValueError(f"Уровень сжатия {codec} должен быть от {levels[0]} до {levels[-1]}")
+
+def make_compressor(codec, level=None):
+    if codec == 'zlib':
+        import zlib
+        return zlib.compressobj(level if level is not None else 6, zlib.DEFLATED, 31)
+    if codec == 'lzma':
+        import lzma
+        return lzma.LZMACompressor(preset=level if level is not None else 6)
+    if codec == 'bz2':
+        import bz2
+        return bz2.BZ2Compressor(level if level is not None else 9)
+    raise ValueError(f"Неизвестный алгоритм сжатия: '{codec}'")
+
+def open_part(source):
+    codec = source.get('compression')
+    if codec == 'zlib':
+        import gzip
+        return gzip.open(source['path'], 'rb')
+    if codec == 'lzma':
+        import lzma
+        return lzma.open(source['path'], 'rb')
+    if codec == 'bz2':
+        import bz2
+        return bz2.open(source['path'], 'rb')
+    return open(source['path'], 'rb')
+
+class CompressedWriter:
+    # Сжимает поток на лету; снаружи выглядит как файл, в который пишут по порядку.
+    def __init__(self, f_out, codec, level=None, algorithm='sha256'):
+        self.f_out = f_out
+        self.compressor = make_compressor(codec, level)
+        self.position = 0
+        self.stored_length = 0
+        self.stored_hash = new_hasher(algorithm) if algorithm else None
+
+    def _emit(self, data):
+        if data:
+            self.f_out.write(data)
+            self.stored_length += len(data)
+            if self.stored_hash is not None:
+                self.stored_hash.update(data)
+
+    def write(self, data):
+        self._emit(self.compressor.compress(data))
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, position):
+        if position != self.position:
+            raise io.UnsupportedOperation("Сжатый поток пишется только последовательно")
+        return position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._emit(self.compressor.flush())
+
+def part_filename(base_name, extension, index):
+    return f"{os.path.basename(base_name)}_part_{index:03d}{extension}"
+
+def write_part(f_in, output_filepath, index, offset, length, buffer, algorithm='sha256', whole_hash=None,
+               compression=None, level=None, sync=False):
+    part_hash = new_hasher(algorithm) if algorithm else None
+    hashers = [h for h in (whole_hash, part_hash) if h is not None]
+    part = {'index': index, 'name': os.path.basename(output_filepath), 'offset': offset, 'length': length}
+    with open(output_filepath, 'wb') as f_out:
+        if compression:
+            writer = CompressedWriter(f_out, compression, level, algorithm)
+            copy_range(f_in, writer, offset, length, buffer=buffer, hashers=hashers, zero_copy=False)
+            writer.close()
+        else:
+            copy_range(f_in, f_out, offset, length, buffer=buffer, hashers=hashers)
+        if sync:
+            f_out.flush()
+            os.fsync(f_out.fileno())
+    return finish_part_record(part, part_hash, writer if compression else None)
+
+def finish_part_record(part, part_hash, writer=None):
+    part['digest'] = part_hash.hexdigest() if part_hash else None
+    if isinstance(part_hash, TreeHasher):
+        part['leaves'] = part_hash.leaves_hex()
+    if writer is not None:
+        part['stored_length'] = writer.stored_length
+        part['stored_digest'] = writer.stored_hash.hexdigest() if writer.stored_hash else None
+    return part
+
+def write_stream_part(stream, output_filepath, index, offset, chunk_size, view, algorithm='sha256', whole_hash=None,
+                      compression=None, level=None):
+    # Часть из потока без известного размера: файл создается только когда пришли данные,
+    # и заканчивается на chunk_size байтах или на конце потока.
+    n = stream.readinto(view[:min(len(view), chunk_size)])
+    if not n:
+        return None
+    part_hash = new_hasher(algorithm) if algorithm else None
+    hashers = [h for h in (whole_hash, part_hash) if h is not None]
+    length = 0
+    with open(output_filepath, 'wb') as f_out:
+        writer = CompressedWriter(f_out, compression, level, algorithm) if compression else f_out
+        while n:
+            chunk = view[:n]
+            for hash_func in hashers:
+                hash_func.update(chunk)
+            writer.write(chunk)
+            PROGRESS.advance(n)
+            length += n
+            if length == chunk_size:
+                break
+            n = stream.readinto(view[:min(len(view), chunk_size - length)])
+        if compression:
+            writer.close()
+    part = {'index': index, 'name': os.path.basename(output_filepath), 'offset': offset, 'length': length}
+    return finish_part_record(part, part_hash, writer if compression else None)
+
+def print_part_created(part, output_folder_name=None):
+    # Вместе с сообщением подписчикам PROGRESS уходит событие 'part' с путем к готовому
+    # файлу части — по нему, например, часть загружается в хранилище, не дожидаясь конца.
+    if output_folder_name is not None and PROGRESS.callbacks:
+        PROGRESS.emit({'event': 'part', **{k: v for k, v in part.items() if k != 'leaves'},
+                       'path': os.path.join(output_folder_name, part['name'])})
+    if 'stored_length' in part:
+        print(f"{Colors.OKCYAN}Создана часть:{Colors.ENDC} '{part['name']}'. Размер: {format_file_size(part['length'])}"
+              f" → {format_file_size(part['stored_length'])}.")
+    else:
+        print(f"{Colors.OKCYAN}Создана часть:{Colors.ENDC} '{part['name']}'. Размер: {format_file_size(part['length'])}.")
+
+def write_parts(source_path, output_folder_name, base_name, extension, ranges, buffer_size=None, algorithm='sha256', jobs=1,
+                journal=None, done=None, compression=None, level=None):
+    done = done or {}
+    if compression:
+        extension += COMPRESSION_SUFFIXES[compression]
+    if jobs > 1 and len(ranges) > 1:
+        return write_parts_parallel(source_path, output_folder_name, base_name, extension, ranges,
+                                    buffer_size, algorithm, jobs, journal, done, compression, level)
+
+    buffer = allocate_buffer(buffer_size)
+    whole_hash = new_hasher(algorithm) if algorithm else None
+    parts = []
+    with open(source_path, 'rb') as f_in:
+        for index, offset, length in ranges:
+            if index in done:
+                # Состояние hashlib нельзя сохранить в журнал, поэтому общий хеш
+                # догоняется чтением уже готового диапазона — без повторной записи.
+                # У дерева хешей листья готовой части берутся прямо из журнала.
+                if isinstance(whole_hash, TreeHasher) and 'leaves' in done[index]:
+                    whole_hash.add_leaves(done[index]['leaves'])
+                elif whole_hash is not None:
+                    hash_range(f_in, offset, length, [whole_hash], buffer, track=True)
+                parts.append(done[index])
+                print(f"{Colors.OKBLUE}Часть уже готова:{Colors.ENDC} '{done[index]['name']}'.")
+                continue
+
+            output_filepath = os.path.join(output_folder_name, part_filename(base_name, extension, index))
+            part = write_part(f_in, output_filepath, index, offset, length, buffer, algorithm, whole_hash,
+                              compression, level, sync=journal is not None)
+            parts.append(part)
+            if journal is not None:
+                journal.append({'event': 'part', **part})
+            print_part_created(part, output_folder_name)
+
+    return (whole_hash.hexdigest() if whole_hash else None), parts
+
+def write_parts_parallel(source_path, output_folder_name, base_name, extension, ranges, buffer_size=None, algorithm='sha256', jobs=2,
+                         journal=None, done=None, compression=None, level=None):
+    from concurrent.futures import ThreadPoolExecutor
+
+    done = done or {}
+    # Каждый поток держит свои дескрипторы и свой буфер: позиции чтения/записи
+    # не разделяются, а память ограничена jobs * размер буфера.
+    local = threading.local()
+
+    def get_buffer():
+        if not hasattr(local, 'buffer'):
+            local.buffer = allocate_buffer(buffer_size)
+        return local.buffer
+
+    def copy_part(index, offset, length):
+        if index in done:
+            return done[index]
+        output_filepath = os.path.join(output_folder_name, part_filename(base_name, extension, index))
+        with open(source_path, 'rb') as f_in:
+            part = write_part(f_in, output_filepath, index, offset, length, get_buffer(), algorithm, None,
+                              compression, level, sync=journal is not None)
+        if journal is not None:
+            journal.append({'event': 'part', **part})
+        return part
+
+    def hash_whole():
+        whole_hash = new_hasher(algorithm)
+        with open(source_path, 'rb') as f_in:
+            hash_range(f_in, 0, sum(r[2] for r in ranges), [whole_hash], allocate_buffer(buffer_size))
+        return whole_hash.hexdigest()
+
+    # Общий SHA-256 считается строго последовательно, поэтому для него нужен отдельный
+    # читающий поток; корень дерева хешей собирается из листьев частей без чтения.
+    sequential_whole = algorithm and not is_tree_algorithm(algorithm)
+    parts = []
+    with ThreadPoolExecutor(max_workers=jobs + (1 if sequential_whole else 0)) as pool:
+        whole_future = pool.submit(hash_whole) if sequential_whole else None
+        futures = [pool.submit(PROGRESS.bind(copy_part), *r) for r in ranges]
+        for (index, _, _), future in zip(ranges, futures):
+            part = future.result()
+            parts.append(part)
+            if index in done:
+                print(f"{Colors.OKBLUE}Часть уже готова:{Colors.ENDC} '{part['name']}'.")
+            else:
+                print_part_created(part, output_folder_name)
+        whole_digest = whole_future.result() if whole_future else None
+
+    if is_tree_algorithm(algorithm):
+        whole_hash = new_hasher(algorithm)
+        for part in parts:
+            whole_hash.add_leaves(part['leaves'])
+        whole_digest = whole_hash.hexdigest()
+
+    return whole_digest, parts
+
+def consume_split_parts(source_path, output_folder_name, base_name, extension, ranges, buffer_size=None,
+                        algorithm='sha256', journal=None, records=None, verify=False, compression=None, level=None):
+    # Части вырезаются с конца исходного файла, и после каждой готовой части он
+    # укорачивается: на диске одновременно лежит не больше одной лишней части.
+    records = records or {}
+    if compression:
+        extension += COMPRESSION_SUFFIXES[compression]
+    buffer = allocate_buffer(buffer_size)
+
+    done = {}
+    for index, offset, length in ranges:
+        record = records.get(index)
+        if record is None or record['offset'] != offset or record['length'] != length:
+            continue
+        part_path = os.path.join(output_folder_name, record['name'])
+        stored_digest = record.get('stored_digest') or record.get('digest')
+        if not check_part_file(part_path, record.get('stored_length', length), stored_digest, algorithm, verify, buffer):
+            raise RuntimeError(f"Часть '{record['name']}' повреждена, а ее данные уже вырезаны из исходного файла")
+        done[index] = {k: v for k, v in record.items() if k != 'event'}
+    remaining = [r for r in ranges if r[0] not in done]
+    expected_size = remaining[-1][1] + remaining[-1][2] if remaining else 0
+    source_size = os.path.getsize(source_path)
+    if source_size < expected_size:
+        raise RuntimeError(f"Исходный файл короче ожидаемого ({source_size} байт вместо {expected_size}), данные утеряны")
+    if done:
+        print(f"{Colors.OKGREEN}Продолжаем: {len(done)} из {len(ranges)} частей уже готовы.{Colors.ENDC}")
+
+    original_hash = None
+    if algorithm and not is_tree_algorithm(algorithm):
+        # Части пишутся с конца, поэтому обычный хеш считается заранее и сохраняется
+        # в журнал до первого укорачивания файла. Дереву хешей это не нужно.
+        original_hash = next((r['digest'] for r in journal.records if r.get('event') == 'hash'), None)
+        if original_hash is None:
+            if done or source_size != (ranges[-1][1] + ranges[-1][2] if ranges else 0):
+                raise RuntimeError("Хеш исходного файла не найден в журнале, а файл уже укорочен")
+            print(f"{Colors.OKCYAN}Вычисляем хеш исходного файла перед разделением...{Colors.ENDC}")
+            original_hash = calculate_file_hash(source_path, algorithm, buffer_size)
+            if original_hash is None:
+                raise RuntimeError("Не удалось вычислить хеш исходного файла")
+            journal.append({'event': 'hash', 'digest': original_hash})
+
+    with open(source_path, 'r+b') as f_in:
+        if source_size > expected_size:
+            f_in.truncate(expected_size)
+            os.fsync(f_in.fileno())
+        for index, offset, length in reversed(remaining):
+            output_filepath = os.path.join(output_folder_name, part_filename(base_name, extension, index))
+            part = write_part(f_in, output_filepath, index, offset, length, buffer, algorithm, None,
+                              compression, level, sync=True)
+            # Запись о новой части в папке должна пережить сбой раньше, чем ее данные
+            # будут вырезаны из исходного файла.
+            fsync_directory(output_folder_name)
+            journal.append({'event': 'part', **part})
+            f_in.truncate(offset)
+            os.fsync(f_in.fileno())
+            done[index] = part
+            print_part_created(part, output_folder_name)
+
+    parts = [done[index] for index, _, _ in ranges]
+    if is_tree_algorithm(algorithm):
+        hash_name, leaf_size = parse_hash_algorithm(algorithm)
+        tree = TreeHasher(hash_name, leaf_size)
+        for part in parts:
+            tree.add_leaves(part['leaves'])
+        original_hash = tree.hexdigest()
+    return original_hash, parts
+
+class GF256:
+    # Арифметика поля GF(2^8) (многочлен 0x11d) для кода Рида-Соломона. Умножение целого
+    # блока на константу — одна табличная подстановка bytes.translate (она быстрее
+    # индексирования таблицы в NumPy), сложение — XOR массивов NumPy или длинных целых.
+    # Побайтовых циклов в Python нет.
+    def __init__(self):
+        self.exp = [0] * 512
+        self.log = [0] * 256
+        x = 1
+        for i in range(255):
+            self.exp[i] = x
+            self.log[x] = i
+            x <<= 1
+            if x & 0x100:
+                x ^= 0x11d
+        for i in range(255, 512):
+            self.exp[i] = self.exp[i - 255]
+        self.tables = [bytes(self.mul(c, v) for v in range(256)) for c in range(256)]
+        try:
+            import numpy
+            self.np = numpy
+        except ImportError:
+            self.np = None
+
+    def mul(self, a, b):
+        if a == 0 or b == 0:
+            return 0
+        return self.exp[self.log[a] + self.log[b]]
+
+    def inverse(self, a):
+        return self.exp[255 - self.log[a]]
+
+    def cauchy(self, rows, cols):
+        # Любая квадратная подматрица матрицы Коши обратима, поэтому по любым
+        # rows уцелевшим частям четности восстанавливаются rows потерянных частей.
+        return [[self.inverse(r ^ (rows + c)) for c in range(cols)] for r in range(rows)]
+
+    def invert(self, matrix):
+        n = len(matrix)
+        rows = [list(row) + [int(i == j) for j in range(n)] for i, row in enumerate(matrix)]
+        for col in range(n):
+            pivot = next(r for r in range(col, n) if rows[r][col])
+            rows[col], rows[pivot] = rows[pivot], rows[col]
+            scale = self.inverse(rows[col][col])
+            rows[col] = [self.mul(v, scale) for v in rows[col]]
+            for r in range(n):
+                if r != col and rows[r][col]:
+                    factor = rows[r][col]
+                    rows[r] = [v ^ self.mul(factor, p) for v, p in zip(rows[r], rows[col])]
+        return [row[n:] for row in rows]
+
+    def zeros(self, size):
+        return self.np.zeros(size, dtype=self.np.uint8) if self.np is not None else 0
+
+    def add_scaled(self, acc, coef, block):
+        # acc ^= coef * block; блок короче acc считается дополненным нулями.
+        if coef == 0 or not block:
+            return acc
+        if coef != 1:
+            block = block.translate(self.tables[coef])
+        if self.np is not None:
+            data = self.np.frombuffer(block, dtype=self.np.uint8)
+            self.np.bitwise_xor(acc[:len(data)], data, out=acc[:len(data)])
+            return acc
+        return acc ^ int.from_bytes(block, 'little')
+
+    def to_bytes(self, acc, size):
+        return acc.tobytes() if self.np is not None else acc.to_bytes(size, 'little')
+
+def parity_groups(count, k):
+    if count == 0:
+        return []
+    group_count = math.ceil(count / (256 - k))
+    size = math.ceil(count / group_count)
+    return [list(range(start, min(start + size, count))) for start in range(0, count, size)]
+
+def write_parity(output_folder_name, base_name, parts, k, algorithm='sha256', buffer_size=None):
+    # Части четности считаются по сохраненным файлам частей (после сжатия), поэтому
+    # восстановленная часть побайтно совпадает с исходной и проверяется ее же хешем.
+    # Части короче самой длинной в группе считаются дополненными нулями.
+    gf = GF256()
+    block_size = len(allocate_buffer(buffer_size))
+    groups = []
+    for group_number, members in enumerate(parity_groups(len(parts), k), 1):
+        stripe = max(parts[i].get('stored_length', parts[i]['length']) for i in members)
+        matrix = gf.cauchy(k, len(members))
+        names = [f"{os.path.basename(base_name)}_parity_{group_number:02d}_{r:02d}.rs" for r in range(1, k + 1)]
+        hashers = [new_hasher(algorithm) if algorithm else None for _ in names]
+        files = [open(os.path.join(output_folder_name, parts[i]['name']), 'rb') for i in members]
+        outputs = [open(os.path.join(output_folder_name, name), 'wb') for name in names]
+        try:
+            for offset in range(0, stripe, block_size):
+                size = min(block_size, stripe - offset)
+                accs = [gf.zeros(size) for _ in range(k)]
+                for col, f_part in enumerate(files):
+                    block = f_part.read(size)
+                    for r in range(k):
+                        accs[r] = gf.add_scaled(accs[r], matrix[r][col], block)
+                for r in range(k):
+                    data = gf.to_bytes(accs[r], size)
+                    outputs[r].write(data)
+                    if hashers[r] is not None:
+                        hashers[r].update(data)
+        finally:
+            for f in files + outputs:
+                f.close()
+        groups.append({'parts': [parts[i]['index'] for i in members], 'length': stripe,
+                       'parity': [{'name': name, 'digest': h.hexdigest() if h else None}
+                                  for name, h in zip(names, hashers)]})
+    return {'scheme': PARITY_SCHEME, 'k': k, 'groups': groups}
+
+def rebuild_group(parts_folder, group, members, missing, rows, k, gf, buffer_size=None):
+    matrix = gf.cauchy(k, len(members))
+    inverse = gf.invert([[matrix[r][c] for c in missing] for r in rows])
+    block_size = len(allocate_buffer(buffer_size))
+    good = [c for c in range(len(members)) if c not in missing]
+    files = {c: open(os.path.join(parts_folder, members[c]['name']), 'rb') for c in good}
+    parity_files = [open(os.path.join(parts_folder, group['parity'][r]['name']), 'rb') for r in rows]
+    outputs = [open(os.path.join(parts_folder, members[c]['name'] + '.tmp'), 'wb') for c in missing]
+    lengths = [members[c].get('stored_length', members[c]['length']) for c in missing]
+    try:
+        for offset in range(0, group['length'], block_size):
+            size = min(block_size, group['length'] - offset)
+            # Синдром: четность минус вклад уцелевших частей = вклад потерянных частей.
+            syndromes = [gf.add_scaled(gf.zeros(size), 1, f_parity.read(size)) for f_parity in parity_files]
+            for c in good:
+                block = files[c].read(size)
+                for j, r in enumerate(rows):
+                    syndromes[j] = gf.add_scaled(syndromes[j], matrix[r][c], block)
+            syndromes = [gf.to_bytes(s, size) for s in syndromes]
+            for m, f_out in enumerate(outputs):
+                keep = min(size, lengths[m] - offset)
+                if keep <= 0:
+                    continue
+                acc = gf.zeros(size)
+                for j, syndrome in enumerate(syndromes):
+                    acc = gf.add_scaled(acc, inverse[m][j], syndrome)
+                f_out.write(gf.to_bytes(acc, size)[:keep])
+    finally:
+        for f in list(files.values()) + parity_files + outputs:
+            f.close()
+    return sum(lengths)
+
+def repair_parts(parts_folder, manifest, buffer_size=None, jobs=1):
+    # Проверяет сохраненные части по хешам и восстанавливает отсутствующие и
+    # поврежденные части из частей четности. Возвращает True, если все части целы.
+    from concurrent.futures import ThreadPoolExecutor
+
+    parity = manifest['parity']
+    algorithm = manifest['algorithm']
+    by_index = {p['index']: p for p in manifest['parts']}
+
+    def part_ok(part):
+        return check_part_file(os.path.join(parts_folder, part['name']), part.get('stored_length', part['length']),
+                               part.get('stored_digest') or part['digest'], algorithm, verify=True)
+
+    print(f"{Colors.OKCYAN}Проверяем части по хешам (четность: {parity['k']} на группу)...{Colors.ENDC}")
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        bad = {p['index'] for p, ok in zip(manifest['parts'], pool.map(part_ok, manifest['parts'])) if not ok}
+    if not bad:
+        print(f"{Colors.OKGREEN}✓ Все части целы.{Colors.ENDC}")
+        return True
+
+    gf = GF256()
+    repaired = True
+    started = time.perf_counter()
+    rebuilt_bytes = 0
+    processed_bytes = 0
+    for group_number, group in enumerate(parity['groups'], 1):
+        members = [by_index[i] for i in group['parts']]
+        missing = [c for c, part in enumerate(members) if part['index'] in bad]
+        if not missing:
+            continue
+        rows = [r for r, p in enumerate(group['parity'])
+                if check_part_file(os.path.join(parts_folder, p['name']), group['length'], p['digest'], algorithm, True)]
+        if len(missing) > len(rows):
+            print(f"{Colors.FAIL}✗ Группа {group_number}: повреждено частей — {len(missing)}, "
+                  f"а целых частей четности только {len(rows)}. Восстановление невозможно.{Colors.ENDC}")
+            repaired = False
+            continue
+        rebuilt_bytes += rebuild_group(parts_folder, group, members, missing, rows[:len(missing)], parity['k'], gf,
+                                       buffer_size)
+        processed_bytes += group['length'] * len(members)
+        for c in missing:
+            part = members[c]
+            part_path = os.path.join(parts_folder, part['name'])
+            if part_ok({**part, 'name': part['name'] + '.tmp'}):
+                os.replace(part_path + '.tmp', part_path)
+                print(f"{Colors.OKGREEN}✓ Часть '{part['name']}' восстановлена из четности.{Colors.ENDC}")
+            else:
+                os.remove(part_path + '.tmp')
+                print(f"{Colors.FAIL}✗ Часть '{part['name']}' не удалось восстановить.{Colors.ENDC}")
+                repaired = False
+    elapsed = time.perf_counter() - started
+    speed = processed_bytes / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+    print(f"{Colors.OKCYAN}Восстановление:{Colors.ENDC} {format_file_size(rebuilt_bytes)} за {elapsed:.2f} с, "
+          f"декодирование {speed:.1f} MB/s")
+    return repaired
+
+def write_part_digests(output_folder_name, parts, algorithm='sha256'):
+    if not algorithm or is_tree_algorithm(algorithm) or not parts:
+        return None
+    digests_file = os.path.join(output_folder_name, f"!split_hashes.{algorithm}")
+    with open(digests_file, 'w', encoding='utf-8', newline='\n') as f_digests:
+        for part in parts:
+            f_digests.write(f"{part.get('stored_digest') or part['digest']}  {part['name']}\n")
+    return digests_file
+
+def read_part_digests(parts_folder, algorithm='sha256'):
+    digests_file = os.path.join(parts_folder, f"!split_hashes.{algorithm}")
+    digests = {}
+    if os.path.exists(digests_file):
+        with open(digests_file, 'r', encoding='utf-8') as f_digests:
+            for line in f_digests:
+                digest, sep, name = line.rstrip('\n').partition('  ')
+                if sep:
+                    digests[name] = digest
+    return digests
+
+def write_manifest(output_folder_name, original_name, file_size, algorithm, original_hash, split_info, parts,
+                   compression=None, parity=None):
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': MANIFEST_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'original_name': original_name,
+        'size': file_size,
+        'algorithm': algorithm,
+        'hash': original_hash,
+        'split': split_info,
+        'compression': compression,
+        'parts': parts,
+    }
+    if parity:
+        manifest['parity'] = parity
+    manifest_file = os.path.join(output_folder_name, MANIFEST_NAME)
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f_manifest:
+        json.dump(manifest, f_manifest, ensure_ascii=False, indent=1)
+    os.replace(tmp_file, manifest_file)
+    return manifest_file
+
+def load_manifest(parts_folder):
+    manifest_file = os.path.join(parts_folder, MANIFEST_NAME)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, 'r', encoding='utf-8') as f_manifest:
+        manifest = json.load(f_manifest)
+    if manifest.get('format') != MANIFEST_FORMAT:
+        raise ValueError(f"'{manifest_file}' не является манифестом разделения")
+    if manifest.get('version', 0) > MANIFEST_VERSION:
+        raise ValueError(f"Манифест версии {manifest.get('version')} не поддерживается, обновите программу")
+    return manifest
+
+def manifest_sources(parts_folder, manifest):
+    base_folder = parts_folder
+    if manifest['split'].get('chunk_store'):
+        base_folder = os.path.join(parts_folder, manifest['split']['chunk_store'])
+    codec = (manifest.get('compression') or {}).get('codec')
+    return [{'name': p['name'], 'path': os.path.join(base_folder, p['name']), 'offset': p['offset'],
+             'length': p['length'], 'digest': p['digest'], 'compression': codec,
+             'stored_length': p.get('stored_length', p['length'])}
+            for p in manifest['parts']]
+
+def check_parts_present(sources):
+    problems = []
+    for source in sources:
+        try:
+            actual = os.stat(source['path']).st_size
+        except FileNotFoundError:
+            problems.append(f"часть '{source['name']}' отсутствует")
+            continue
+        expected = source.get('stored_length', source['length'])
+        if actual != expected:
+            problems.append(f"часть '{source['name']}' имеет размер {actual} байт вместо {expected}")
+    return problems
+
+def natural_sort_key(name):
+    return [int(token) if token.isdigit() else token for token in re.split(r'(\d+)', name)]
+
+def preallocate_file(f_out, size):
+    if size <= 0:
+        return
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f_out.fileno(), 0, size)
             return
+        except OSError as e:
+            if e.errno not in ZERO_COPY_FALLBACK_ERRNOS:
+                raise
+    f_out.truncate(size)
 
-        if not os.path.exists(input_filename):
-            print(f"{Colors.FAIL}\nОшибка: Файл '{input_filename}' не найден.{Colors.ENDC}")
+def join_parts(sources, output_filename, buffer_size=None, algorithm='sha256', jobs=1, whole_hash=False,
+               journal=None, done=None):
+    done = done or set()
+    total_size = sum(s['length'] for s in sources)
+    if not done:
+        with open(output_filename, 'wb') as f_out:
+            preallocate_file(f_out, total_size)
+
+    def check_part(part_hash, expected):
+        return part_hash is None or part_hash.hexdigest() == expected
+
+    def finish_part(index, source, f_part_out, ok):
+        if ok and journal is not None:
+            f_part_out.flush()
+            os.fsync(f_part_out.fileno())
+            journal.append({'event': 'part', 'index': index, 'name': source['name']})
+        return ok
+
+    bad_parts = []
+    if jobs > 1 and len(sources) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        local = threading.local()
+
+        def copy_part(index, source):
+            if source['name'] in done:
+                return True
+            if not hasattr(local, 'buffer'):
+                local.buffer = allocate_buffer(buffer_size)
+            part_hash = new_hasher(algorithm) if algorithm and source['digest'] else None
+            with open_part(source) as f_in, open(output_filename, 'r+b') as f_part_out:
+                copy_range(f_in, f_part_out, 0, source['length'], out_offset=source['offset'], buffer=local.buffer,
+                           hashers=[part_hash] if part_hash else (), zero_copy=not source.get('compression'))
+                return finish_part(index, source, f_part_out, check_part(part_hash, source['digest']))
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(PROGRESS.bind(copy_part), i, s) for i, s in enumerate(sources)]
+            for source, future in zip(sources, futures):
+                ok = future.result()
+                if source['name'] in done:
+                    print(f"{Colors.OKBLUE}Часть уже добавлена:{Colors.ENDC} {source['name']}")
+                else:
+                    print(f"{Colors.OKCYAN}Добавлена часть:{Colors.ENDC} {source['name']} ({format_file_size(source['length'])})")
+                if not ok:
+                    bad_parts.append(source['name'])
+        return None, bad_parts
+
+    buffer = allocate_buffer(buffer_size)
+    running_hash = new_hasher(algorithm) if algorithm and whole_hash else None
+    with open(output_filename, 'r+b') as f_out:
+        for index, source in enumerate(sources):
+            name, offset, length = source['name'], source['offset'], source['length']
+            if name in done:
+                if running_hash is not None:
+                    hash_range(f_out, offset, length, [running_hash], buffer, track=True)
+                print(f"{Colors.OKBLUE}Часть уже добавлена:{Colors.ENDC} {name}")
+                continue
+            print(f"{Colors.OKCYAN}Добавляем часть:{Colors.ENDC} {name} ({format_file_size(length)})")
+            part_hash = new_hasher(algorithm) if algorithm and source['digest'] else None
+            hashers = [h for h in (running_hash, part_hash) if h is not None]
+            with open_part(source) as f_in:
+                copy_range(f_in, f_out, 0, length, out_offset=offset, buffer=buffer, hashers=hashers,
+                           zero_copy=not source.get('compression'))
+            if not finish_part(index, source, f_out, check_part(part_hash, source['digest'])):
+                bad_parts.append(name)
+    return (running_hash.hexdigest() if running_hash else None), bad_parts
+
+def consume_join_parts(sources, output_filename, buffer_size=None, algorithm='sha256', whole_hash=False,
+                       journal=None, records=None, verify=False):
+    # Части дописываются в конец результата по одной и удаляются сразу после
+    # проверки хеша: место на диске освобождается по мере объединения.
+    records = records or {}
+    done_count = 0
+    for index, source in enumerate(sources):
+        record = records.get(index)
+        if record is None or record['name'] != source['name']:
+            break
+        done_count += 1
+    done_size = sum(s['length'] for s in sources[:done_count])
+    if done_count:
+        print(f"{Colors.OKGREEN}Продолжаем: {done_count} из {len(sources)} частей уже добавлены.{Colors.ENDC}")
+
+    buffer = allocate_buffer(buffer_size)
+    running_hash = new_hasher(algorithm) if algorithm and whole_hash else None
+    with open(output_filename, 'r+b' if done_count else 'wb') as f_out:
+        if done_count:
+            actual_size = os.fstat(f_out.fileno()).st_size
+            if actual_size < done_size:
+                raise RuntimeError(f"Файл '{output_filename}' короче, чем отмечено в журнале: "
+                                   f"{actual_size} байт вместо {done_size}")
+            f_out.truncate(done_size)
+        for index, source in enumerate(sources):
+            name, offset, length = source['name'], source['offset'], source['length']
+            part_hash = new_hasher(algorithm) if algorithm and source['digest'] else None
+            if index < done_count:
+                hashers = [h for h in (running_hash, verify and part_hash) if h]
+                if hashers:
+                    hash_range(f_out, offset, length, hashers, buffer, track=True)
+                if verify and part_hash is not None and part_hash.hexdigest() != source['digest']:
+                    raise RuntimeError(f"Данные части '{name}' в '{output_filename}' повреждены, а сама часть уже удалена")
+                if os.path.exists(source['path']):
+                    os.remove(source['path'])
+                print(f"{Colors.OKBLUE}Часть уже добавлена:{Colors.ENDC} {name}")
+                continue
+            print(f"{Colors.OKCYAN}Добавляем часть:{Colors.ENDC} {name} ({format_file_size(length)})")
+            hashers = [h for h in (running_hash, part_hash) if h is not None]
+            with open_part(source) as f_in:
+                copy_range(f_in, f_out, 0, length, out_offset=offset, buffer=buffer, hashers=hashers,
+                           zero_copy=not source.get('compression'))
+            if part_hash is not None and part_hash.hexdigest() != source['digest']:
+                # Поврежденная часть и все следующие остаются на месте: после ее
+                # замены объединение можно продолжить через --resume.
+                f_out.truncate(offset)
+                return None, [name]
+            f_out.flush()
+            os.fsync(f_out.fileno())
+            # Часть удаляется только после того, как на диске закреплена и запись
+            # о результате в его папке.
+            fsync_directory(os.path.dirname(os.path.abspath(output_filename)))
+            journal.append({'event': 'part', 'index': index, 'name': name})
+            os.remove(source['path'])
+            print(f"{Colors.OKGREEN}Часть удалена:{Colors.ENDC} {name}")
+    return (running_hash.hexdigest() if running_hash else None), []
+
+def stream_parts(sources, f_out, buffer_size=None, algorithm='sha256', whole_hash=False):
+    # Последовательная выдача частей в поток без seek (stdout): хеши частей и общий хеш
+    # считаются на лету. На поврежденной части выдача останавливается.
+    view = memoryview(allocate_buffer(buffer_size))
+    running_hash = new_hasher(algorithm) if algorithm and whole_hash else None
+    for source in sources:
+        name, length = source['name'], source['length']
+        part_hash = new_hasher(algorithm) if algorithm and source['digest'] else None
+        hashers = [h for h in (running_hash, part_hash) if h is not None]
+        with open_part(source) as f_in:
+            copied = 0
+            while copied < length:
+                n = f_in.readinto(view[:min(len(view), length - copied)])
+                if not n:
+                    raise EOFError(f"Неожиданный конец части '{name}' на смещении {copied}")
+                chunk = view[:n]
+                for hash_func in hashers:
+                    hash_func.update(chunk)
+                f_out.write(chunk)
+                PROGRESS.advance(n)
+                copied += n
+        print(f"{Colors.OKCYAN}Выдана часть:{Colors.ENDC} {name} ({format_file_size(length)})")
+        if part_hash is not None and part_hash.hexdigest() != source['digest']:
+            f_out.flush()
+            return None, [name]
+    f_out.flush()
+    return (running_hash.hexdigest() if running_hash else None), []
+
+def resume_join_parts(output_filename, records, sources, algorithm='sha256', verify=False, buffer_size=None):
+    done = set()
+    if not records or not os.path.exists(output_filename):
+        return done
+    if os.path.getsize(output_filename) != sum(s['length'] for s in sources):
+        return done
+    buffer = allocate_buffer(buffer_size) if verify else None
+    with open(output_filename, 'rb') as f_out:
+        for index, source in enumerate(sources):
+            record = records.get(index)
+            if record is None or record['name'] != source['name']:
+                continue
+            if verify and source['digest'] and algorithm:
+                part_hash = new_hasher(algorithm)
+                hash_range(f_out, source['offset'], source['length'], [part_hash], buffer)
+                if part_hash.hexdigest() != source['digest']:
+                    continue
+            done.add(source['name'])
+    if done:
+        print(f"{Colors.OKGREEN}Продолжаем: {len(done)} из {len(sources)} частей уже добавлены.{Colors.ENDC}")
+    return done
+
+def consumed_source_size(output_folder_name, source_path):
+    # После прерванного разделения с --consume исходный файл уже укорочен,
+    # поэтому его первоначальный размер берется из заголовка журнала.
+    records = Journal(os.path.join(output_folder_name, SPLIT_JOURNAL_NAME)).load()
+    if records and records[0].get('op') == 'split' and records[0].get('consume'):
+        return records[0]['size']
+    return os.path.getsize(source_path)
+
+def find_split_source(input_filename, output_folder_name, resume=False):
+    if os.path.exists(input_filename):
+        return input_filename
+    original_file_in_parts = os.path.join(output_folder_name, os.path.basename(input_filename))
+    if resume and os.path.exists(original_file_in_parts):
+        print(f"{Colors.WARNING}Исходный файл уже в папке с частями: '{original_file_in_parts}'{Colors.ENDC}")
+        return original_file_in_parts
+    return None
+
+def write_split_info(output_folder_name, input_filename, file_size, num_parts, original_hash, chunk_size=None,
+                     algorithm='sha256'):
+    base_name, extension = os.path.splitext(input_filename)
+    info_file = os.path.join(output_folder_name, "!split_info.txt")
+    with open(info_file, 'w', encoding='utf-8') as f_info:
+        f_info.write(f"Информация о разделении файла\n")
+        f_info.write(f"=============================\n")
+        f_info.write(f"Исходный файл: {os.path.basename(input_filename)}\n")
+        f_info.write(f"Дата разделения: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f_info.write(f"Размер исходного файла: {file_size} байт ({format_file_size(file_size)})\n")
+        if chunk_size is not None:
+            f_info.write(f"Размер части: {chunk_size} байт ({format_file_size(chunk_size)})\n")
+        f_info.write(f"Количество частей: {num_parts}\n")
+        if original_hash:
+            f_info.write(f"Хеш исходного файла ({hash_algorithm_label(algorithm)}): {original_hash}\n")
+        f_info.write(f"\nДля объединения частей используйте эту же программу\n")
+        f_info.write(f"или команду в командной строке:\n")
+        f_info.write(f"copy /b \"{os.path.basename(base_name)}_part_*{extension}\" \"{os.path.basename(input_filename)}\"\n")
+    return info_file
+
+def run_split(input_filename, output_folder_name, source_path, file_size, ranges, split_info,
+              buffer_size=None, algorithm='sha256', jobs=1, resume=False, verify=False, compression=None, level=None,
+              consume=False, parity=0):
+    base_name, extension = os.path.splitext(input_filename)
+    original_file_in_parts = os.path.join(output_folder_name, os.path.basename(input_filename))
+    if source_path != original_file_in_parts and safe_move_file(source_path, original_file_in_parts):
+        print(f"{Colors.OKGREEN}Исходный файл перемещен в папку с частями.{Colors.ENDC}")
+
+    header = {'event': 'start', 'op': 'split', 'original_name': os.path.basename(input_filename),
+              'size': file_size, 'algorithm': algorithm, 'split': split_info,
+              'compression': compression and {'codec': compression, 'level': level}}
+    if consume:
+        header['consume'] = True
+    journal, records = open_journal(output_folder_name, SPLIT_JOURNAL_NAME, header, resume)
+
+    started = time.perf_counter()
+    if consume:
+        if jobs > 1:
+            print(f"{Colors.WARNING}С --consume части вырезаются по одной, --jobs игнорируется.{Colors.ENDC}")
+        with PROGRESS.operation('split', file_size):
+            original_hash, parts = consume_split_parts(original_file_in_parts, output_folder_name, base_name,
+                                                       extension, ranges, buffer_size, algorithm, journal, records,
+                                                       verify, compression, level)
+    else:
+        done = resume_split_parts(output_folder_name, records, ranges, algorithm, verify, buffer_size) if records else {}
+        with PROGRESS.operation('split', file_size):
+            original_hash, parts = write_parts(original_file_in_parts, output_folder_name, base_name, extension,
+                                               ranges, buffer_size, algorithm, jobs, journal, done, compression, level)
+    elapsed = time.perf_counter() - started
+
+    finish_split(input_filename, output_folder_name, file_size, split_info, algorithm, original_hash, parts,
+                 elapsed, compression, level, parity, buffer_size)
+    if consume and os.path.exists(original_file_in_parts):
+        os.remove(original_file_in_parts)
+        print(f"{Colors.OKGREEN}Исходный файл полностью разобран на части и удален.{Colors.ENDC}")
+    journal.close(remove=True)
+
+def finish_split(input_filename, output_folder_name, file_size, split_info, algorithm, original_hash, parts,
+                 elapsed, compression=None, level=None, parity=0, buffer_size=None):
+    print(f"\n{Colors.OKGREEN}--- Готово! Все части файла успешно созданы в папке '{output_folder_name}'. ---{Colors.ENDC}")
+    if original_hash:
+        print(f"{Colors.OKCYAN}Хеш исходного файла ({hash_algorithm_label(algorithm)}):{Colors.ENDC} {original_hash}")
+    if compression:
+        stored_size = sum(p['stored_length'] for p in parts)
+        ratio = file_size / stored_size if stored_size else 1.0
+        speed = file_size / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+        print(f"{Colors.OKCYAN}Сжатие {compression} (уровень {level if level is not None else 'по умолчанию'}):{Colors.ENDC} "
+              f"{format_file_size(file_size)} → {format_file_size(stored_size)}, "
+              f"степень {ratio:.2f}x, скорость {speed:.1f} MB/s")
+    parity_info = None
+    if parity:
+        started = time.perf_counter()
+        parity_info = write_parity(output_folder_name, os.path.splitext(input_filename)[0], parts, parity,
+                                   algorithm, buffer_size)
+        parity_elapsed = time.perf_counter() - started
+        stored_size = sum(p.get('stored_length', p['length']) for p in parts)
+        split_speed = file_size / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+        parity_speed = stored_size / parity_elapsed / 1024 ** 2 if parity_elapsed > 0 else 0.0
+        parity_count = sum(len(g['parity']) for g in parity_info['groups'])
+        print(f"{Colors.OKCYAN}Четность:{Colors.ENDC} {parity_count} частей в {len(parity_info['groups'])} группах, "
+              f"кодирование {parity_speed:.1f} MB/s (разделение {split_speed:.1f} MB/s)")
+    digests_file = write_part_digests(output_folder_name, parts, algorithm)
+    if digests_file:
+        print(f"{Colors.OKGREEN}Хеши частей сохранены в '{digests_file}'{Colors.ENDC}")
+    parts = [{k: v for k, v in part.items() if k != 'leaves'} for part in parts]
+    manifest_file = write_manifest(output_folder_name, os.path.basename(input_filename), file_size,
+                                   algorithm, original_hash, split_info, parts,
+                                   compression and {'codec': compression, 'level': level}, parity_info)
+    print(f"{Colors.OKGREEN}Создан манифест: '{manifest_file}'{Colors.ENDC}")
+
+    info_file = write_split_info(output_folder_name, input_filename, file_size, len(parts), original_hash,
+                                 split_info.get('part_size'), algorithm)
+    print(f"{Colors.OKGREEN}Создан файл с информацией: '{info_file}'{Colors.ENDC}")
+
+def split_file(input_filename, num_parts_str, buffer_size=None, algorithm='sha256', jobs=1, resume=False, verify=False,
+               compression=None, level=None, consume=False, parity=0, raise_errors=False):
+    try:
+        try:
+            num_parts = int(num_parts_str)
+        except ValueError as e:
+            print(f"{Colors.FAIL}\nОшибка: Количество частей должно быть целым числом.{Colors.ENDC}")
             play_sound("error")
-            return
+            raise SplitterError(f"Количество частей должно быть целым числом: {num_parts_str}") from e
+        try:
+            check_compression(compression, level)
+        except ValueError as e:
+            raise report_error(f"\nОшибка: {e}.")
+        if num_parts <= 0:
+            raise report_error("\nОшибка: Количество частей должно быть больше нуля.")
 
         base_name, extension = os.path.splitext(input_filename)
         output_folder_name = f"{base_name}_parts"
+
+        source_path = find_split_source(input_filename, output_folder_name, resume)
+        if source_path is None:
+            raise report_error(f"\nОшибка: Файл '{input_filename}' не найден.")
         
         if not os.path.exists(output_folder_name):
             os.makedirs(output_folder_name)
@@ -139,85 +1572,79 @@ def split_file(input_filename, num_parts_str):
         else:
             print(f"{Colors.WARNING}Папка '{output_folder_name}' уже существует. Части будут сохранены в неё.{Colors.ENDC}")
 
-        file_size = os.path.getsize(input_filename)
+        if consume and resume:
+            file_size = consumed_source_size(output_folder_name, source_path)
+        else:
+            file_size = os.path.getsize(source_path)
         chunk_size = file_size // num_parts
-        remainder = file_size % num_parts
-
-        original_hash = calculate_file_hash(input_filename, 'sha256')
-        if original_hash:
-            print(f"{Colors.OKCYAN}Хеш исходного файла (SHA-256):{Colors.ENDC} {original_hash}")
+        # Число блоков в каждой части; None — части одинакового размера, остаток в последней.
+        part_leaves = None
+        if is_tree_algorithm(algorithm):
+            # Границы частей должны совпадать с границами блоков дерева хешей, поэтому
+            # целые блоки распределяются между частями поровну (разница — не больше
+            # одного блока), а неполный последний блок достается последней части.
+            hash_name, leaf_size = parse_hash_algorithm(algorithm)
+            if chunk_size >= leaf_size:
+                per_part, extra = divmod(file_size // leaf_size, num_parts)
+                part_leaves = [per_part + (1 if i < extra else 0) for i in range(num_parts)]
+            elif chunk_size > 0:
+                leaf_size = chunk_size
+            algorithm = f"tree-{hash_name}:{leaf_size}"
 
         print(f"\n{Colors.HEADER}--- Начинаем разделение файла ---{Colors.ENDC}")
         print(f"{Colors.OKBLUE}Файл:{Colors.ENDC} '{input_filename}'")
         print(f"{Colors.OKBLUE}Размер файла:{Colors.ENDC} {format_file_size(file_size)}")
         print(f"{Colors.OKBLUE}Будет создано:{Colors.ENDC} {num_parts} частей.")
 
-        original_file_in_parts = os.path.join(output_folder_name, os.path.basename(input_filename))
-        if safe_move_file(input_filename, original_file_in_parts):
-            print(f"{Colors.OKGREEN}Исходный файл перемещен в папку с частями.{Colors.ENDC}")
-
-        with open(original_file_in_parts, 'rb') as f_in:
-            for i in range(num_parts):
-                output_filename_part = f"{base_name}_part_{i+1:03d}{extension}"
-                output_filepath = os.path.join(output_folder_name, output_filename_part)
-                
+        ranges = []
+        offset = 0
+        for i in range(num_parts):
+            if part_leaves is not None:
+                current_chunk_size = part_leaves[i] * leaf_size
+            else:
                 current_chunk_size = chunk_size
-                if i == num_parts - 1:
-                    current_chunk_size += remainder
-                
-                data = f_in.read(current_chunk_size)
-                
-                with open(output_filepath, 'wb') as f_out:
-                    f_out.write(data)
-                
-                print(f"{Colors.OKCYAN}Создана часть:{Colors.ENDC} '{output_filename_part}'. Размер: {format_file_size(len(data))}.")
-        
-        print(f"\n{Colors.OKGREEN}--- Готово! Все части файла успешно созданы в папке '{output_folder_name}'. ---{Colors.ENDC}")
-        
-        info_file = os.path.join(output_folder_name, "!split_info.txt")
-        with open(info_file, 'w', encoding='utf-8') as f_info:
-            f_info.write(f"Информация о разделении файла\n")
-            f_info.write(f"=============================\n")
-            f_info.write(f"Исходный файл: {os.path.basename(input_filename)}\n")
-            f_info.write(f"Дата разделения: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f_info.write(f"Размер исходного файла: {file_size} байт ({format_file_size(file_size)})\n")
-            f_info.write(f"Количество частей: {num_parts}\n")
-            if original_hash:
-                f_info.write(f"Хеш исходного файла (SHA-256): {original_hash}\n")
-            f_info.write(f"\nДля объединения частей используйте эту же программу\n")
-            f_info.write(f"или команду в командной строке:\n")
-            f_info.write(f"copy /b \"{base_name}_part_*{extension}\" \"{os.path.basename(input_filename)}\"\n")
-        
-        print(f"{Colors.OKGREEN}Создан файл с информацией: '{info_file}'{Colors.ENDC}")
+            if i == num_parts - 1:
+                current_chunk_size = file_size - offset
+            ranges.append((i + 1, offset, current_chunk_size))
+            offset += current_chunk_size
+
+        run_split(input_filename, output_folder_name, source_path, file_size, ranges,
+                  {'mode': 'count', 'parts': num_parts}, buffer_size, algorithm, jobs, resume, verify,
+                  compression, level, consume, parity)
         play_sound("success")
+        return output_folder_name
 
-    except ValueError:
-        print(f"{Colors.FAIL}\nОшибка: Количество частей должно быть целым числом.{Colors.ENDC}")
-        play_sound("error")
+    except SplitterError:
+        if raise_errors:
+            raise
     except Exception as e:
         print(f"{Colors.FAIL}\nПроизошла непредвиденная ошибка: {e}{Colors.ENDC}")
         play_sound("error")
+        if raise_errors:
+            raise
 
-def split_by_size(input_filename, chunk_size_str):
+def split_by_size(input_filename, chunk_size_str, buffer_size=None, algorithm='sha256', jobs=1, resume=False, verify=False,
+                  compression=None, level=None, consume=False, parity=0, raise_errors=False):
     try:
-        size_units = {'B': 1, 'KB': 1024, 'MB': 1024**2, 'GB': 1024**3}
-        chunk_size_str = chunk_size_str.upper().replace(' ', '')
-        
-        unit = ''.join(filter(str.isalpha, chunk_size_str))
-        value = ''.join(filter(str.isdigit, chunk_size_str))
-        
-        if not value:
-            raise ValueError("Не указан размер части")
-            
-        chunk_size = int(value) * size_units.get(unit, 1)
+        chunk_size = parse_size(chunk_size_str)
+        try:
+            check_compression(compression, level)
+        except ValueError as e:
+            raise report_error(f"\nОшибка: {e}.")
         
         if chunk_size <= 0:
-            print(f"{Colors.FAIL}\nОшибка: Размер части должен быть больше нуля.{Colors.ENDC}")
-            play_sound("error")
-            return
+            raise report_error("\nОшибка: Размер части должен быть больше нуля.")
+
+        if is_tree_algorithm(algorithm):
+            hash_name, leaf_size = parse_hash_algorithm(algorithm)
+            algorithm = f"tree-{hash_name}:{tree_leaf_size_for_part(chunk_size, leaf_size)}"
 
         base_name, extension = os.path.splitext(input_filename)
         output_folder_name = f"{base_name}_parts"
+
+        source_path = find_split_source(input_filename, output_folder_name, resume)
+        if source_path is None:
+            raise report_error(f"\nОшибка: Файл '{input_filename}' не найден.")
         
         if not os.path.exists(output_folder_name):
             os.makedirs(output_folder_name)
@@ -225,7 +1652,10 @@ def split_by_size(input_filename, chunk_size_str):
         else:
             print(f"{Colors.WARNING}Папка '{output_folder_name}' уже существует. Части будут сохранены в неё.{Colors.ENDC}")
 
-        file_size = os.path.getsize(input_filename)
+        if consume and resume:
+            file_size = consumed_source_size(output_folder_name, source_path)
+        else:
+            file_size = os.path.getsize(source_path)
         num_parts = math.ceil(file_size / chunk_size)
         
         print(f"\n{Colors.HEADER}--- Начинаем разделение файла по размеру ---{Colors.ENDC}")
@@ -234,78 +1664,786 @@ def split_by_size(input_filename, chunk_size_str):
         print(f"{Colors.OKBLUE}Размер части:{Colors.ENDC} {format_file_size(chunk_size)}")
         print(f"{Colors.OKBLUE}Будет создано:{Colors.ENDC} {num_parts} частей.")
 
-        original_hash = calculate_file_hash(input_filename, 'sha256')
-        if original_hash:
-            print(f"{Colors.OKCYAN}Хеш исходного файла (SHA-256):{Colors.ENDC} {original_hash}")
+        ranges = []
+        for i in range(num_parts):
+            offset = i * chunk_size
+            ranges.append((i + 1, offset, min(chunk_size, file_size - offset)))
 
-        original_file_in_parts = os.path.join(output_folder_name, os.path.basename(input_filename))
-        if safe_move_file(input_filename, original_file_in_parts):
-            print(f"{Colors.OKGREEN}Исходный файл перемещен в папку с частями.{Colors.ENDC}")
+        run_split(input_filename, output_folder_name, source_path, file_size, ranges,
+                  {'mode': 'size', 'part_size': chunk_size}, buffer_size, algorithm, jobs, resume, verify,
+                  compression, level, consume, parity)
+        play_sound("success")
+        return output_folder_name
+
+    except SplitterError:
+        if raise_errors:
+            raise
+    except Exception as e:
+        print(f"{Colors.FAIL}\nПроизошла ошибка: {e}{Colors.ENDC}")
+        play_sound("error")
+        if raise_errors:
+            raise
+
+def split_stream(output_name, chunk_size_str, buffer_size=None, algorithm='sha256', compression=None, level=None,
+                 stream=None, parity=0):
+    # Разделение потока (например, pg_dump | main.py --split-size - dump.sql 1GB):
+    # размер заранее неизвестен, части пишутся по мере поступления данных,
+    # а манифест создается в конце потока.
+    try:
+        chunk_size = parse_size(chunk_size_str)
+        check_compression(compression, level)
+
+        if chunk_size <= 0:
+            print(f"{Colors.FAIL}\nОшибка: Размер части должен быть больше нуля.{Colors.ENDC}")
+            play_sound("error")
+            return
+
+        if is_tree_algorithm(algorithm):
+            hash_name, leaf_size = parse_hash_algorithm(algorithm)
+            algorithm = f"tree-{hash_name}:{tree_leaf_size_for_part(chunk_size, leaf_size)}"
 
-        part_num = 1
-        with open(original_file_in_parts, 'rb') as f_in:
+        base_name, extension = os.path.splitext(output_name)
+        output_folder_name = f"{base_name}_parts"
+        if not os.path.exists(output_folder_name):
+            os.makedirs(output_folder_name)
+            print(f"{Colors.OKGREEN}Создана папка для частей: '{output_folder_name}'{Colors.ENDC}")
+        else:
+            print(f"{Colors.WARNING}Папка '{output_folder_name}' уже существует. Части будут сохранены в неё.{Colors.ENDC}")
+        if compression:
+            extension += COMPRESSION_SUFFIXES[compression]
+
+        print(f"\n{Colors.HEADER}--- Начинаем разделение потока ---{Colors.ENDC}")
+        print(f"{Colors.OKBLUE}Источник:{Colors.ENDC} стандартный ввод → '{output_name}'")
+        print(f"{Colors.OKBLUE}Размер части:{Colors.ENDC} {format_file_size(chunk_size)}")
+
+        stream = stream if stream is not None else sys.stdin.buffer
+        view = memoryview(allocate_buffer(buffer_size))
+        whole_hash = new_hasher(algorithm) if algorithm else None
+        parts = []
+        file_size = 0
+        started = time.perf_counter()
+        with PROGRESS.operation('split'):
             while True:
-                data = f_in.read(chunk_size)
-                if not data:
+                index = len(parts) + 1
+                output_filepath = os.path.join(output_folder_name, part_filename(base_name, extension, index))
+                part = write_stream_part(stream, output_filepath, index, file_size, chunk_size, view, algorithm,
+                                         whole_hash, compression, level)
+                if part is None:
                     break
-                    
-                output_filename_part = f"{base_name}_part_{part_num:03d}{extension}"
-                output_filepath = os.path.join(output_folder_name, output_filename_part)
-                
-                with open(output_filepath, 'wb') as f_out:
-                    f_out.write(data)
-                
-                print(f"{Colors.OKCYAN}Создана часть:{Colors.ENDC} '{output_filename_part}'. Размер: {format_file_size(len(data))}.")
-                part_num += 1
-        
-        print(f"\n{Colors.OKGREEN}--- Готово! Все части файла успешно созданы в папке '{output_folder_name}'. ---{Colors.ENDC}")
-        
-        info_file = os.path.join(output_folder_name, "!split_info.txt")
-        with open(info_file, 'w', encoding='utf-8') as f_info:
-            f_info.write(f"Информация о разделении файла\n")
-            f_info.write(f"=============================\n")
-            f_info.write(f"Исходный файл: {os.path.basename(input_filename)}\n")
-            f_info.write(f"Дата разделения: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f_info.write(f"Размер исходного файла: {file_size} байт ({format_file_size(file_size)})\n")
-            f_info.write(f"Размер части: {chunk_size} байт ({format_file_size(chunk_size)})\n")
-            f_info.write(f"Количество частей: {part_num-1}\n")
-            if original_hash:
-                f_info.write(f"Хеш исходного файла (SHA-256): {original_hash}\n")
-            f_info.write(f"\nДля объединения частей используйте эту же программу\n")
-            f_info.write(f"или команду в командной строке:\n")
-            f_info.write(f"copy /b \"{base_name}_part_*{extension}\" \"{os.path.basename(input_filename)}\"\n")
-        
-        print(f"{Colors.OKGREEN}Создан файл с информацией: '{info_file}'{Colors.ENDC}")
+                parts.append(part)
+                file_size += part['length']
+                print_part_created(part, output_folder_name)
+                if part['length'] < chunk_size:
+                    break
+        elapsed = time.perf_counter() - started
+
+        finish_split(output_name, output_folder_name, file_size, {'mode': 'size', 'part_size': chunk_size},
+                     algorithm, whole_hash.hexdigest() if whole_hash else None, parts, elapsed, compression, level,
+                     parity, buffer_size)
         play_sound("success")
+        return output_folder_name
 
     except Exception as e:
         print(f"{Colors.FAIL}\nПроизошла ошибка: {e}{Colors.ENDC}")
         play_sound("error")
 
-def join_files(parts_folder, output_filename=None):
+def gear_table():
+    import hashlib
+    return [int.from_bytes(hashlib.sha256(b'db-divider-gear' + bytes([i])).digest()[:8], 'little')
+            for i in range(256)]
+
+class GearChunker:
+    # Gear/FastCDC: граница там, где старшие биты хеша скользящего окна из 64 байт равны нулю.
+    # До среднего размера используется более строгая маска, после — более мягкая.
+    def __init__(self, avg_size=CDC_DEFAULT_AVG, min_size=None, max_size=None):
+        self.avg_size = avg_size
+        self.min_size = min_size if min_size is not None else max(avg_size // 4, 64)
+        self.max_size = max_size if max_size is not None else avg_size * 4
+        if not 0 < self.min_size <= self.avg_size <= self.max_size:
+            raise ValueError("Размеры CDC должны удовлетворять условию min <= avg <= max")
+        bits = max(int(round(math.log2(avg_size))), 4)
+        self.mask_s = ((1 << (bits + 2)) - 1) << (64 - bits - 2)
+        self.mask_l = ((1 << (bits - 2)) - 1) << (64 - bits + 2)
+        self.table = gear_table()
+        self.chunk_len = 0
+        self.h = 0
+        self.history = b''
+        try:
+            import numpy
+            self.np = numpy
+            self.np_table = numpy.array(self.table, dtype=numpy.uint64)
+            self.np_hash = numpy.empty(CDC_NP_BLOCK + 63, dtype=numpy.uint64)
+            self.np_tmp = numpy.empty(CDC_NP_BLOCK + 63, dtype=numpy.uint64)
+        except ImportError:
+            self.np = None
+
+    def _candidates(self, block):
+        if self.np is not None:
+            np = self.np
+            data = np.frombuffer(self.history + bytes(block), dtype=np.uint8)
+            history = len(self.history)
+            mask_s, mask_l = np.uint64(self.mask_s), np.uint64(self.mask_l)
+            strict, loose = [], []
+            # Считаем блоками по CDC_NP_BLOCK байт с нахлестом в 63 байта: рабочие массивы
+            # помещаются в кэш процессора, что в разы быстрее прохода по всему буферу.
+            for start in range(history, len(data), CDC_NP_BLOCK):
+                lo = max(0, start - 63)
+                segment = data[lo:start + CDC_NP_BLOCK]
+                n = len(segment)
+                h, tmp = self.np_hash[:n], self.np_tmp[:n]
+                np.take(self.np_table, segment, out=h, mode='clip')
+                # Хеш окна из 2w байт складывается из двух окон по w: H2w[i] = Hw[i] + (Hw[i-w] << w),
+                # поэтому 64-байтовое окно считается за 6 векторных шагов вместо цикла по байтам.
+                w = 1
+                while w < min(64, n):
+                    np.left_shift(h[:n - w], np.uint64(w), out=tmp[:n - w])
+                    np.add(h[w:], tmp[:n - w], out=h[w:])
+                    w *= 2
+                h = h[start - lo:]
+                np.bitwise_and(h, mask_l, out=tmp[:len(h)])
+                found = np.flatnonzero(tmp[:len(h)] == 0)
+                loose.extend((found + (start - history + 1)).tolist())
+                strict.extend((found[(h[found] & mask_s) == 0] + (start - history + 1)).tolist())
+            self.history = (self.history + bytes(block[-63:]))[-63:]
+            return strict, loose
+
+        table, mask_s, mask_l = self.table, self.mask_s, self.mask_l
+        h = self.h
+        strict, loose = [], []
+        for i, b in enumerate(block):
+            h = ((h << 1) + table[b]) & 0xFFFFFFFFFFFFFFFF
+            if not h & mask_l:
+                loose.append(i + 1)
+                if not h & mask_s:
+                    strict.append(i + 1)
+        self.h = h
+        return strict, loose
+
+    def feed(self, block):
+        def first(candidates, lo, hi):
+            i = bisect.bisect_left(candidates, lo)
+            if i < len(candidates) and candidates[i] < hi:
+                return candidates[i]
+            return None
+
+        strict, loose = self._candidates(block)
+        n = len(block)
+        start = -self.chunk_len
+        cuts = []
+        while True:
+            a, b, c = start + self.min_size, start + self.avg_size, start + self.max_size
+            end = first(strict, a, min(b, n + 1))
+            if end is None:
+                if b > n:
+                    break
+                end = first(loose, b, min(c, n + 1))
+                if end is None:
+                    if c > n:
+                        break
+                    end = c
+            cuts.append(end)
+            start = end
+        self.chunk_len = n - start
+        return cuts
+
+def store_chunk(chunk_store, data):
+    import hashlib
+    digest = hashlib.sha256(data).hexdigest()
+    name = f"{digest[:2]}/{digest}"
+    chunk_path = os.path.join(chunk_store, digest[:2], digest)
+    if os.path.exists(chunk_path) and os.path.getsize(chunk_path) == len(data):
+        return name, digest, False
+    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+    tmp_path = f"{chunk_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f_chunk:
+        f_chunk.write(data)
+    os.replace(tmp_path, chunk_path)
+    return name, digest, True
+
+def write_cdc_chunks(source_path, chunk_store, chunker, buffer_size=None):
+    import hashlib
+    buffer = allocate_buffer(buffer_size or CDC_SCAN_BLOCK)
+    view = memoryview(buffer)
+    whole_hash = hashlib.sha256()
+    pending = bytearray()
+    parts = []
+    offset = 0
+    stored_bytes = 0
+
+    def emit(data):
+        nonlocal offset, stored_bytes
+        name, digest, is_new = store_chunk(chunk_store, data)
+        if is_new:
+            stored_bytes += len(data)
+        parts.append({'index': len(parts) + 1, 'name': name, 'offset': offset, 'length': len(data), 'digest': digest})
+        offset += len(data)
+
+    with open(source_path, 'rb') as f_in:
+        while True:
+            n = f_in.readinto(view)
+            if not n:
+                break
+            block = view[:n]
+            whole_hash.update(block)
+            PROGRESS.advance(n)
+            last = 0
+            for cut in chunker.feed(block):
+                pending += block[last:cut]
+                emit(bytes(pending))
+                pending.clear()
+                last = cut
+            pending += block[last:]
+    if pending:
+        emit(bytes(pending))
+
+    return whole_hash.hexdigest(), parts, stored_bytes
+
+def split_cdc(input_filename, chunk_store=None, avg_size_str=None, min_size_str=None, max_size_str=None, buffer_size=None):
     try:
-        if not os.path.exists(parts_folder):
-            print(f"{Colors.FAIL}Папка '{parts_folder}' не существует.{Colors.ENDC}")
+        avg_size = parse_size(avg_size_str) if avg_size_str else CDC_DEFAULT_AVG
+        chunker = GearChunker(avg_size,
+                              parse_size(min_size_str) if min_size_str else None,
+                              parse_size(max_size_str) if max_size_str else None)
+
+        if not os.path.exists(input_filename):
+            print(f"{Colors.FAIL}\nОшибка: Файл '{input_filename}' не найден.{Colors.ENDC}")
             play_sound("error")
             return
+
+        base_name, extension = os.path.splitext(input_filename)
+        output_folder_name = f"{base_name}_parts"
+        if chunk_store is None:
+            chunk_store = os.path.join(os.path.dirname(input_filename), CDC_DEFAULT_STORE)
+
+        if not os.path.exists(output_folder_name):
+            os.makedirs(output_folder_name)
+            print(f"{Colors.OKGREEN}Создана папка для манифеста: '{output_folder_name}'{Colors.ENDC}")
+        else:
+            print(f"{Colors.WARNING}Папка '{output_folder_name}' уже существует. Манифест будет сохранен в неё.{Colors.ENDC}")
+        os.makedirs(chunk_store, exist_ok=True)
+
+        file_size = os.path.getsize(input_filename)
+        print(f"\n{Colors.HEADER}--- Начинаем разделение по содержимому (CDC) ---{Colors.ENDC}")
+        print(f"{Colors.OKBLUE}Файл:{Colors.ENDC} '{input_filename}'")
+        print(f"{Colors.OKBLUE}Размер файла:{Colors.ENDC} {format_file_size(file_size)}")
+        print(f"{Colors.OKBLUE}Размер чанка (мин/сред/макс):{Colors.ENDC} {format_file_size(chunker.min_size)} / "
+              f"{format_file_size(chunker.avg_size)} / {format_file_size(chunker.max_size)}")
+        print(f"{Colors.OKBLUE}Хранилище чанков:{Colors.ENDC} '{chunk_store}'")
+        if chunker.np is None:
+            print(f"{Colors.WARNING}NumPy не установлен: поиск границ выполняется медленно, по одному байту.{Colors.ENDC}")
+
+        original_file_in_parts = os.path.join(output_folder_name, os.path.basename(input_filename))
+        if safe_move_file(input_filename, original_file_in_parts):
+            print(f"{Colors.OKGREEN}Исходный файл перемещен в папку с частями.{Colors.ENDC}")
+
+        with PROGRESS.operation('split', file_size):
+            original_hash, parts, stored_bytes = write_cdc_chunks(original_file_in_parts, chunk_store, chunker,
+                                                                  buffer_size)
+        new_chunks = len({p['name'] for p in parts})
+
+        split_info = {'mode': 'cdc', 'min': chunker.min_size, 'avg': chunker.avg_size, 'max': chunker.max_size,
+                      'chunk_store': os.path.relpath(chunk_store, output_folder_name)}
+        manifest_file = write_manifest(output_folder_name, os.path.basename(input_filename), file_size,
+                                       'sha256', original_hash, split_info, parts)
+
+        dedup_ratio = file_size / stored_bytes if stored_bytes else float('inf')
+        print(f"\n{Colors.OKGREEN}--- Готово! Файл разбит на {len(parts)} чанков ({new_chunks} уникальных). ---{Colors.ENDC}")
+        print(f"{Colors.OKCYAN}Хеш исходного файла (SHA-256):{Colors.ENDC} {original_hash}")
+        print(f"{Colors.OKCYAN}Записано новых данных:{Colors.ENDC} {format_file_size(stored_bytes)} "
+              f"из {format_file_size(file_size)}")
+        if stored_bytes:
+            print(f"{Colors.OKCYAN}Коэффициент дедупликации:{Colors.ENDC} {dedup_ratio:.2f}x")
+        else:
+            print(f"{Colors.OKCYAN}Коэффициент дедупликации:{Colors.ENDC} все чанки уже были в хранилище")
+        print(f"{Colors.OKGREEN}Создан манифест: '{manifest_file}'{Colors.ENDC}")
+        play_sound("success")
+
+    except Exception as e:
+        print(f"{Colors.FAIL}\nПроизошла ошибка: {e}{Colors.ENDC}")
+        play_sound("error")
+
+def walk_tree(root, skip=None):
+    # Обход без рекурсии через os.scandir: тип и stat берутся из DirEntry, без отдельных
+    # вызовов stat на каждый файл. Папка выдается раньше своего содержимого.
+    stack = [('', root)]
+    while stack:
+        rel_dir, path = stack.pop()
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if skip is not None and os.path.abspath(entry.path) == skip:
+                continue
+            yield rel_path, entry
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append((rel_path, entry.path))
+        stack.extend(reversed(subdirs))
+
+def volume_extents(offset, length, volume_size):
+    extents = []
+    while length > 0:
+        index, within = divmod(offset, volume_size)
+        n = min(length, volume_size - within)
+        extents.append([index + 1, within, n])
+        offset += n
+        length -= n
+    return extents
+
+class VolumeWriter:
+    # Непрерывный поток байтов, нарезанный на тома фиксированного размера: файлы пишутся
+    # друг за другом, и файл может начаться в одном томе и закончиться в следующем.
+    def __init__(self, output_folder_name, base_name, volume_size, algorithm='sha256'):
+        self.output_folder_name = output_folder_name
+        self.base_name = base_name
+        self.volume_size = volume_size
+        self.algorithm = algorithm
+        self.whole_hash = new_hasher(algorithm) if algorithm else None
+        self.offset = 0
+        self.parts = []
+        self.f_out = None
+
+    def _open_volume(self):
+        index = len(self.parts) + 1
+        name = part_filename(self.base_name, DIR_VOLUME_EXTENSION, index)
+        self.f_out = open(os.path.join(self.output_folder_name, name), 'wb')
+        self.part = {'index': index, 'name': name, 'offset': self.offset, 'length': 0}
+        self.part_hash = new_hasher(self.algorithm) if self.algorithm else None
+        self.parts.append(self.part)
+
+    def _close_volume(self):
+        self.f_out.close()
+        self.f_out = None
+        finish_part_record(self.part, self.part_hash)
+        print_part_created(self.part, self.output_folder_name)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            if self.f_out is None:
+                self._open_volume()
+            n = min(len(view), self.volume_size - self.part['length'])
+            chunk = view[:n]
+            self.f_out.write(chunk)
+            for hash_func in (self.part_hash, self.whole_hash):
+                if hash_func is not None:
+                    hash_func.update(chunk)
+            self.part['length'] += n
+            self.offset += n
+            view = view[n:]
+            if self.part['length'] == self.volume_size:
+                self._close_volume()
+
+    def close(self):
+        if self.f_out is not None:
+            self._close_volume()
+
+def pack_file(entry, rel_path, writer, view, algorithm='sha256'):
+    # Размер берется по фактически прочитанному, а не по stat: файл мог измениться во время обхода.
+    stat = entry.stat(follow_symlinks=False)
+    file_hash = new_hasher(algorithm) if algorithm else None
+    offset = writer.offset
+    with open(entry.path, 'rb') as f_in:
+        for n in iter(lambda: f_in.readinto(view), 0):
+            chunk = view[:n]
+            if file_hash is not None:
+                file_hash.update(chunk)
+            writer.write(chunk)
+            PROGRESS.advance(n)
+    length = writer.offset - offset
+    return {'path': rel_path, 'type': 'file', 'size': length, 'mode': stat.st_mode & 0o7777,
+            'mtime': stat.st_mtime, 'offset': offset, 'digest': file_hash.hexdigest() if file_hash else None,
+            'extents': volume_extents(offset, length, writer.volume_size)}
+
+def write_dir_index(output_folder_name, root_name, volume_size, algorithm, entries):
+    index = {
+        'format': DIR_INDEX_FORMAT,
+        'version': DIR_INDEX_VERSION,
+        'root': root_name,
+        'volume_size': volume_size,
+        'algorithm': algorithm,
+        'entries': entries,
+    }
+    index_file = os.path.join(output_folder_name, DIR_INDEX_NAME)
+    tmp_file = index_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f_index:
+        json.dump(index, f_index, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_file, index_file)
+    return index_file
+
+def load_dir_index(parts_folder):
+    index_file = os.path.join(parts_folder, DIR_INDEX_NAME)
+    with open(index_file, 'r', encoding='utf-8') as f_index:
+        index = json.load(f_index)
+    if index.get('format') != DIR_INDEX_FORMAT:
+        raise ValueError(f"'{index_file}' не является индексом папки")
+    if index.get('version', 0) > DIR_INDEX_VERSION:
+        raise ValueError(f"Индекс версии {index.get('version')} не поддерживается, обновите программу")
+    return index
+
+def split_directory(root, volume_size_str, buffer_size=None, algorithm='sha256', parity=0, raise_errors=False):
+    # Упаковка дерева папок в тома за один проход, без промежуточного tar-архива.
+    try:
+        volume_size = parse_size(volume_size_str)
+        if volume_size <= 0:
+            raise report_error("\nОшибка: Размер тома должен быть больше нуля.")
+        if not os.path.isdir(root):
+            raise report_error(f"\nОшибка: Папка '{root}' не найдена.")
+        if is_tree_algorithm(algorithm):
+            print(f"{Colors.WARNING}Для папок хеши считаются по SHA-256, древовидный хеш не используется.{Colors.ENDC}")
+            algorithm = 'sha256'
+
+        source_root = os.path.normpath(root)
+        if os.path.basename(source_root) in ('', '.', '..'):
+            source_root = os.path.abspath(source_root)
+        root_name = os.path.basename(source_root)
+        output_folder_name = f"{source_root}_parts"
+        if not os.path.exists(output_folder_name):
+            os.makedirs(output_folder_name)
+            print(f"{Colors.OKGREEN}Создана папка для томов: '{output_folder_name}'{Colors.ENDC}")
+        else:
+            print(f"{Colors.WARNING}Папка '{output_folder_name}' уже существует. Тома будут сохранены в неё.{Colors.ENDC}")
+
+        print(f"\n{Colors.HEADER}--- Начинаем упаковку папки в тома ---{Colors.ENDC}")
+        print(f"{Colors.OKBLUE}Папка:{Colors.ENDC} '{root}'")
+        print(f"{Colors.OKBLUE}Размер тома:{Colors.ENDC} {format_file_size(volume_size)}")
+
+        view = memoryview(allocate_buffer(buffer_size))
+        writer = VolumeWriter(output_folder_name, root_name, volume_size, algorithm)
+        entries = []
+        file_count = 0
+        started = time.perf_counter()
+        with PROGRESS.operation('split'):
+            for rel_path, entry in walk_tree(source_root, skip=os.path.abspath(output_folder_name)):
+                if entry.is_symlink():
+                    entries.append({'path': rel_path, 'type': 'symlink', 'target': os.readlink(entry.path)})
+                elif entry.is_dir(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    entries.append({'path': rel_path, 'type': 'dir', 'mode': stat.st_mode & 0o7777,
+                                    'mtime': stat.st_mtime})
+                elif entry.is_file(follow_symlinks=False):
+                    entries.append(pack_file(entry, rel_path, writer, view, algorithm))
+                    file_count += 1
+                else:
+                    print(f"{Colors.WARNING}Пропущен специальный файл: '{rel_path}'{Colors.ENDC}")
+            writer.close()
+        elapsed = time.perf_counter() - started
+
+        index_file = write_dir_index(output_folder_name, root_name, volume_size, algorithm, entries)
+        speed = writer.offset / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+        print(f"{Colors.OKCYAN}Упаковано файлов:{Colors.ENDC} {file_count}, "
+              f"{format_file_size(writer.offset)} в {len(writer.parts)} томах ({speed:.1f} MB/s)")
+        print(f"{Colors.OKGREEN}Создан индекс файлов: '{index_file}'{Colors.ENDC}")
+        finish_split(source_root, output_folder_name, writer.offset,
+                     {'mode': 'dir', 'part_size': volume_size, 'index': DIR_INDEX_NAME, 'files': file_count},
+                     algorithm, writer.whole_hash.hexdigest() if writer.whole_hash else None, writer.parts, elapsed,
+                     parity=parity, buffer_size=buffer_size)
+        play_sound("success")
+        return output_folder_name
+
+    except SplitterError:
+        if raise_errors:
+            raise
+    except Exception as e:
+        print(f"{Colors.FAIL}\nПроизошла ошибка: {e}{Colors.ENDC}")
+        play_sound("error")
+        if raise_errors:
+            raise
+
+def index_entry_path(target, rel_path):
+    # Индекс мог прийти извне вместе с томами: пути не должны выходить за целевую папку.
+    names = rel_path.split('/')
+    if rel_path.startswith('/') or any(name in ('', '.', '..') for name in names):
+        raise ValueError(f"Недопустимый путь в индексе: '{rel_path}'")
+    return os.path.join(target, *names)
+
+def restore_index_file(entry, destination, volumes, handles, buffer, algorithm='sha256'):
+    # Читаются только тома, в которых лежит файл, по смещениям из индекса.
+    file_hash = new_hasher(algorithm) if algorithm and entry.get('digest') else None
+    position = 0
+    with open(destination, 'wb') as f_out:
+        for index, within, length in entry['extents']:
+            f_in = handles.get(index)
+            if f_in is None:
+                f_in = open(volumes[index], 'rb')
+                handles[index] = f_in
+                while len(handles) > DIR_RESTORE_MAX_OPEN:
+                    handles.popitem(last=False)[1].close()
+            else:
+                handles.move_to_end(index)
+            copy_range(f_in, f_out, within, length, out_offset=position, buffer=buffer,
+                       hashers=[file_hash] if file_hash else ())
+            position += length
+    os.chmod(destination, entry['mode'])
+    os.utime(destination, (entry['mtime'], entry['mtime']))
+    return file_hash is None or file_hash.hexdigest() == entry['digest']
+
+def restore_directory(parts_folder, target=None, buffer_size=None, jobs=1, only=None, raise_errors=False):
+    # only — путь файла или папки внутри архива: восстанавливается только он,
+    # и читаются только тома, в которых он лежит.
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+
+        manifest = load_manifest(parts_folder)
+        if manifest is None or manifest['split'].get('mode') != 'dir':
+            raise report_error(f"В папке '{parts_folder}' нет упакованной папки (--split-dir).")
+        index = load_dir_index(parts_folder)
+        algorithm = index.get('algorithm')
+        entries = index['entries']
+        if only is not None:
+            prefix = only.replace(os.sep, '/').strip('/')
+            if prefix.startswith('./'):
+                prefix = prefix[2:]
+            selected = [e for e in entries if e['path'] == prefix or e['path'].startswith(prefix + '/')]
+            if not selected:
+                raise report_error(f"'{only}' нет в индексе '{parts_folder}'.")
+            parents = set()
+            for entry in selected:
+                names = entry['path'].split('/')[:-1]
+                parents.update('/'.join(names[:i]) for i in range(1, len(names) + 1))
+            entries = [e for e in entries if e['path'] in parents and e['type'] == 'dir'] + selected
+        if target is None:
+            target = '.' if only is not None else index['root']
+            if only is None and os.path.exists(target):
+                raise report_error(f"Папка '{target}' уже существует, укажите другую папку для восстановления.")
+
+        files = [e for e in entries if e['type'] == 'file']
+        sources = {part['index']: source for part, source in zip(manifest['parts'],
+                                                                 manifest_sources(parts_folder, manifest))}
+        needed = sorted({extent[0] for entry in files for extent in entry['extents']})
+        if manifest.get('parity') and only is None:
+            if not repair_parts(parts_folder, manifest, buffer_size, jobs):
+                raise report_error("Не все тома удалось восстановить из четности.")
+        problems = check_parts_present([sources[i] for i in needed])
+        if problems:
+            print(f"{Colors.FAIL}Восстановление невозможно:{Colors.ENDC}")
+            for problem in problems:
+                print(f"{Colors.FAIL}  ✗ {problem}{Colors.ENDC}")
+            play_sound("error")
+            raise SplitterError(f"Восстановление невозможно: {'; '.join(problems)}")
+
+        total_size = sum(e['size'] for e in files)
+        print(f"{Colors.HEADER}--- Начинаем восстановление папки ---{Colors.ENDC}")
+        print(f"{Colors.OKBLUE}Файлов:{Colors.ENDC} {len(files)} ({format_file_size(total_size)})")
+        print(f"{Colors.OKBLUE}Томов для чтения:{Colors.ENDC} {len(needed)} из {len(sources)}")
+        print(f"{Colors.OKBLUE}Папка назначения:{Colors.ENDC} '{target}'")
+
+        os.makedirs(target, exist_ok=True)
+        for entry in entries:
+            if entry['type'] == 'dir':
+                os.makedirs(index_entry_path(target, entry['path']), exist_ok=True)
+
+        volumes = {i: sources[i]['path'] for i in needed}
+        local = threading.local()
+        opened = []
+        opened_lock = threading.Lock()
+
+        def restore_one(entry):
+            if not hasattr(local, 'handles'):
+                local.handles = OrderedDict()
+                local.buffer = allocate_buffer(buffer_size)
+                with opened_lock:
+                    opened.append(local.handles)
+            destination = index_entry_path(target, entry['path'])
+            return restore_index_file(entry, destination, volumes, local.handles, local.buffer, algorithm)
+
+        started = time.perf_counter()
+        try:
+            with PROGRESS.operation('join', total_size):
+                with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                    results = list(pool.map(PROGRESS.bind(restore_one), sorted(files, key=lambda e: e['offset'])))
+        finally:
+            for handles in opened:
+                for handle in handles.values():
+                    handle.close()
+        elapsed = time.perf_counter() - started
+        bad_files = [entry['path'] for entry, ok in zip(sorted(files, key=lambda e: e['offset']), results) if not ok]
+
+        for entry in entries:
+            if entry['type'] == 'symlink':
+                link_path = index_entry_path(target, entry['path'])
+                if os.path.lexists(link_path):
+                    os.remove(link_path)
+                os.symlink(entry['target'], link_path)
+        for entry in sorted((e for e in entries if e['type'] == 'dir'), key=lambda e: -e['path'].count('/')):
+            dir_path = index_entry_path(target, entry['path'])
+            os.chmod(dir_path, entry['mode'])
+            os.utime(dir_path, (entry['mtime'], entry['mtime']))
+
+        if bad_files:
+            for path in bad_files:
+                print(f"{Colors.FAIL}✗ Хеш файла '{path}' не совпадает с сохраненным!{Colors.ENDC}")
+            play_sound("error")
+            raise SplitterError(f"Хеш файла '{bad_files[0]}' не совпадает с сохраненным")
+
+        speed = total_size / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+        print(f"\n{Colors.OKGREEN}--- Готово! Восстановлено файлов: {len(files)} в '{target}' "
+              f"({speed:.1f} MB/s) ---{Colors.ENDC}")
+        if algorithm:
+            print(f"{Colors.OKGREEN}✓ Хеши всех файлов совпали!{Colors.ENDC}")
+        play_sound("success")
+        return target
+
+    except SplitterError:
+        if raise_errors:
+            raise
+    except Exception as e:
+        print(f"{Colors.FAIL}\nПроизошла ошибка при восстановлении: {e}{Colors.ENDC}")
+        play_sound("error")
+        if raise_errors:
+            raise
+
+class PartsReader(io.RawIOBase):
+    # Набор частей как один файл только для чтения: смещение переводится в номер части
+    # двоичным поиском, открытые части держатся в LRU-кэше ограниченного размера.
+    def __init__(self, parts_folder, use_mmap=False, max_open=PARTS_READER_MAX_OPEN):
+        super().__init__()
+        manifest = load_manifest(parts_folder)
+        if manifest is not None:
+            self.sources = manifest_sources(parts_folder, manifest)
+            self.name = manifest['original_name']
+        else:
+            self.name, _, part_files = find_legacy_parts(parts_folder)
+            self.sources = []
+            offset = 0
+            for part_file in part_files:
+                part_size = os.path.getsize(os.path.join(parts_folder, part_file))
+                self.sources.append({'name': part_file, 'path': os.path.join(parts_folder, part_file),
+                                     'offset': offset, 'length': part_size, 'digest': None})
+                offset += part_size
+        problems = check_parts_present(self.sources)
+        if problems:
+            raise FileNotFoundError("; ".join(problems))
+        self.offsets = [s['offset'] for s in self.sources]
+        self.size = sum(s['length'] for s in self.sources)
+        self.use_mmap = use_mmap
+        self.max_open = max(1, max_open)
+        self.handles = OrderedDict()
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Недопустимое значение whence: {whence}")
+        if position < 0:
+            raise ValueError("Отрицательная позиция")
+        self.position = position
+        return position
+
+    def _handle(self, index):
+        handle = self.handles.get(index)
+        if handle is not None:
+            self.handles.move_to_end(index)
+            return handle
+        source = self.sources[index]
+        if self.use_mmap and not source.get('compression') and source['length'] > 0:
+            import mmap
+            with open(source['path'], 'rb') as f_part:
+                handle = mmap.mmap(f_part.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            handle = open_part(source)
+        self.handles[index] = handle
+        while len(self.handles) > self.max_open:
+            _, evicted = self.handles.popitem(last=False)
+            evicted.close()
+        return handle
+
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError("Чтение из закрытого PartsReader")
+        view = memoryview(b).cast('B')
+        filled = 0
+        while filled < len(view) and self.position < self.size:
+            index = bisect.bisect_right(self.offsets, self.position) - 1
+            source = self.sources[index]
+            within = self.position - source['offset']
+            n = min(len(view) - filled, source['length'] - within)
+            handle = self._handle(index)
+            if isinstance(handle, (bytes, bytearray)) or not hasattr(handle, 'readinto'):
+                view[filled:filled + n] = handle[within:within + n]
+            else:
+                handle.seek(within)
+                n = handle.readinto(view[filled:filled + n])
+                if not n:
+                    raise EOFError(f"Часть '{source['name']}' короче, чем указано в манифесте")
+            filled += n
+            self.position += n
+        return filled
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+        super().close()
+
+def find_legacy_parts(parts_folder, output_filename=None):
+    all_files = os.listdir(parts_folder)
+    
+    info_files = [f for f in all_files if f.lower().startswith('!split_info')]
+    original_hash = None
+    original_filename = None
+    
+    if info_files:
+        info_file = os.path.join(parts_folder, info_files[0])
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+                if "Хеш исходного файла (SHA-256):" in content:
+                    original_hash = content.split("Хеш исходного файла (SHA-256):")[1].split('\n')[0].strip()
+                if "Исходный файл:" in content:
+                    original_filename = content.split("Исходный файл:")[1].split('\n')[0].strip()
+        except:
+            pass
+    
+    part_files = []
+    
+    for f in all_files:
+        if f.startswith('!') or f == output_filename:
+            continue
         
-        all_files = os.listdir(parts_folder)
-        
-        info_files = [f for f in all_files if f.lower().startswith('!split_info')]
-        original_hash = None
-        original_filename = None
+        if any(x in f for x in ['_part_', '.part', '.001', '.002', '.003']):
+            part_files.append(f)
+        elif f == original_filename:
+            print(f"{Colors.WARNING}Найден исходный файл в папке: '{f}'{Colors.ENDC}")
+    
+    if not part_files:
+        part_files = [f for f in all_files if not f.startswith('!') and f != output_filename and f != original_filename]
+    
+    part_files.sort(key=natural_sort_key)
+    return original_filename, original_hash, part_files
+
+def join_files(parts_folder, output_filename=None, buffer_size=None, jobs=1, resume=False, verify=False, consume=False,
+               stream=None, cleanup=None, raise_errors=False):
+    try:
+        if not os.path.exists(parts_folder):
+            raise report_error(f"Папка '{parts_folder}' не существует.")
         
-        if info_files:
-            info_file = os.path.join(parts_folder, info_files[0])
-            try:
-                with open(info_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if "Хеш исходного файла (SHA-256):" in content:
-                        original_hash = content.split("Хеш исходного файла (SHA-256):")[1].split('\n')[0].strip()
-                    if "Исходный файл:" in content:
-                        original_filename = content.split("Исходный файл:")[1].split('\n')[0].strip()
-            except:
-                pass
+        manifest = load_manifest(parts_folder)
+        if manifest is not None and manifest['split'].get('mode') == 'dir':
+            if output_filename == '-' or consume:
+                raise report_error("Упакованную папку нельзя выдать в stdout или объединить с --consume.")
+            return restore_directory(parts_folder, output_filename, buffer_size, jobs, raise_errors=raise_errors)
+        if manifest is not None:
+            original_filename = manifest['original_name']
+            original_hash = manifest['hash']
+            algorithm = manifest['algorithm']
+        else:
+            original_filename, original_hash, part_files = find_legacy_parts(parts_folder, output_filename)
+            algorithm = 'sha256'
         
         if output_filename is None:
             if original_filename:
@@ -315,64 +2453,621 @@ def join_files(parts_folder, output_filename=None):
                     output_filename = parts_folder[:-6]
                 else:
                     output_filename = f"restored_{os.path.basename(parts_folder)}"
-        
-        part_files = []
-        original_file_in_parts = None
-        
-        for f in all_files:
-            if f.startswith('!') or f == output_filename:
-                continue
-            
-            if any(x in f for x in ['_part_', '.part', '.001', '.002', '.003']):
-                part_files.append(f)
-            elif f == original_filename:
-                original_file_in_parts = f
-                print(f"{Colors.WARNING}Найден исходный файл в папке: '{f}'{Colors.ENDC}")
-        
-        if not part_files:
-            part_files = [f for f in all_files if not f.startswith('!') and f != output_filename and f != original_filename]
-        
-        if not part_files:
-            print(f"{Colors.FAIL}В папке '{parts_folder}' не найдены файлы-части.{Colors.ENDC}")
-            play_sound("error")
-            return
-        
-        part_files.sort()
-        
-        print(f"{Colors.HEADER}--- Начинаем объединение файлов ---{Colors.ENDC}")
-        print(f"{Colors.OKBLUE}Найдено частей:{Colors.ENDC} {len(part_files)}")
-        print(f"{Colors.OKBLUE}Восстанавливаемый файл:{Colors.ENDC} '{output_filename}'")
-        
-        total_size = 0
-        with open(output_filename, 'wb') as f_out:
+
+        to_stream = output_filename == '-'
+        if to_stream and (consume or resume):
+            raise report_error("При выводе в stdout --consume и --resume не поддерживаются.")
+
+        if consume and (manifest is None or manifest['split'].get('chunk_store')):
+            raise report_error("Объединение с --consume возможно только для частей с манифестом "
+                               "и без общего хранилища чанков.")
+
+        if manifest is not None:
+            if manifest.get('parity') and not consume:
+                if not repair_parts(parts_folder, manifest, buffer_size, jobs):
+                    raise report_error("Не все части удалось восстановить из четности.")
+            sources = manifest_sources(parts_folder, manifest)
+            consumed = set()
+            if consume and resume:
+                records = load_journal(parts_folder, JOIN_JOURNAL_NAME,
+                                       join_journal_header(output_filename, sources, consume), resume)
+                consumed = {r['name'] for r in records[1:] if r.get('event') == 'part'}
+            problems = check_parts_present([s for s in sources if s['name'] not in consumed])
+            if sum(s['length'] for s in sources) != manifest['size']:
+                problems.append("сумма размеров частей в манифесте не совпадает с размером файла")
+            if problems:
+                print(f"{Colors.FAIL}Объединение невозможно:{Colors.ENDC}")
+                for problem in problems:
+                    print(f"{Colors.FAIL}  ✗ {problem}{Colors.ENDC}")
+                play_sound("error")
+                raise SplitterError(f"Объединение невозможно: {'; '.join(problems)}")
+        else:
+            part_files = [f for f in part_files if f != output_filename]
+            if not part_files:
+                raise report_error(f"В папке '{parts_folder}' не найдены файлы-части.")
+
+            part_digests = read_part_digests(parts_folder)
+            sources = []
+            offset = 0
             for part_file in part_files:
                 part_path = os.path.join(parts_folder, part_file)
                 part_size = os.path.getsize(part_path)
-                total_size += part_size
-                
-                print(f"{Colors.OKCYAN}Добавляем часть:{Colors.ENDC} {part_file} ({format_file_size(part_size)})")
-                
-                with open(part_path, 'rb') as f_in:
-                    shutil.copyfileobj(f_in, f_out)
+                sources.append({'name': part_file, 'path': part_path, 'offset': offset, 'length': part_size,
+                                'digest': part_digests.get(part_file)})
+                offset += part_size
+        total_size = sum(s['length'] for s in sources)
+        
+        print(f"{Colors.HEADER}--- Начинаем объединение файлов ---{Colors.ENDC}")
+        print(f"{Colors.OKBLUE}Найдено частей:{Colors.ENDC} {len(sources)}")
+        if to_stream:
+            print(f"{Colors.OKBLUE}Восстанавливаемый файл:{Colors.ENDC} стандартный вывод")
+        else:
+            print(f"{Colors.OKBLUE}Восстанавливаемый файл:{Colors.ENDC} '{output_filename}'")
+        
+        all_parts_have_digests = all(s['digest'] for s in sources)
+
+        if to_stream:
+            with PROGRESS.operation('join', total_size):
+                whole_digest, bad_parts = stream_parts(sources, stream if stream is not None else sys.stdout.buffer,
+                                                       buffer_size, algorithm, original_hash is not None)
+            for name in bad_parts:
+                print(f"{Colors.FAIL}✗ Хеш части '{name}' не совпадает с сохраненным! Вывод остановлен.{Colors.ENDC}")
+            if bad_parts:
+                play_sound("error")
+                raise SplitterError(f"Хеш части '{bad_parts[0]}' не совпадает с сохраненным")
+            if original_hash and whole_digest != original_hash:
+                raise report_error("✗ Ошибка целостности файла! Хеши не совпадают.")
+            print(f"{Colors.OKGREEN}--- Готово! Выдано {format_file_size(total_size)} ---{Colors.ENDC}")
+            if original_hash:
+                print(f"{Colors.OKGREEN}✓ Проверка целостности пройдена успешно!{Colors.ENDC}")
+            play_sound("success")
+            return output_filename
+
+        header = join_journal_header(output_filename, sources, consume)
+        journal, records = open_journal(parts_folder, JOIN_JOURNAL_NAME, header, resume)
+        if consume:
+            if jobs > 1:
+                print(f"{Colors.WARNING}С --consume части добавляются по одной, --jobs игнорируется.{Colors.ENDC}")
+            with PROGRESS.operation('join', total_size):
+                whole_digest, bad_parts = consume_join_parts(sources, output_filename, buffer_size, algorithm,
+                                                             original_hash is not None, journal, records, verify)
+        else:
+            done = resume_join_parts(output_filename, records, sources, algorithm, verify, buffer_size)
+            with PROGRESS.operation('join', total_size):
+                whole_digest, bad_parts = join_parts(sources, output_filename, buffer_size, algorithm, jobs,
+                                                     whole_hash=original_hash is not None, journal=journal, done=done)
+        journal.close(remove=not bad_parts)
         
         print(f"{Colors.OKCYAN}Общий размер объединенного файла:{Colors.ENDC} {format_file_size(total_size)}")
+
+        if bad_parts:
+            for name in bad_parts:
+                print(f"{Colors.FAIL}✗ Хеш части '{name}' не совпадает с сохраненным!{Colors.ENDC}")
+            if consume:
+                print(f"{Colors.WARNING}Объединение остановлено перед поврежденной частью. Замените ее "
+                      f"и продолжите с --consume --resume.{Colors.ENDC}")
+            else:
+                print(f"{Colors.FAIL}Объединенный файл '{output_filename}' поврежден.{Colors.ENDC}")
+            play_sound("error")
+            raise SplitterError(f"Хеш части '{bad_parts[0]}' не совпадает с сохраненным")
+
         print(f"\n{Colors.OKGREEN}--- Готово! Файл успешно объединен: '{output_filename}' ---{Colors.ENDC}")
         
         if original_hash:
             print(f"{Colors.OKCYAN}Проверяем целостности объединенного файла...{Colors.ENDC}")
-            if verify_file_integrity(original_hash, output_filename, 'sha256'):
-                if ask_yes_no("Удалить папку с частями после успешного объединения?", default=True):
-                    try:
-                        shutil.rmtree(parts_folder)
-                        print(f"{Colors.OKGREEN}Папка '{parts_folder}' успешно удалена.{Colors.ENDC}")
-                    except Exception as e:
-                        print(f"{Colors.FAIL}Ошибка при удалении папки: {e}{Colors.ENDC}")
+            if whole_digest is not None:
+                verified = whole_digest == original_hash
+                if verified:
+                    print(f"{Colors.OKGREEN}✓ Проверка целостности пройдена успешно!{Colors.ENDC}")
+                else:
+                    print(f"{Colors.FAIL}✗ Ошибка целостности файла! Хеши не совпадают.{Colors.ENDC}")
+            elif all_parts_have_digests:
+                verified = True
+                print(f"{Colors.OKGREEN}✓ Хеши всех частей совпали, проверка целостности пройдена!{Colors.ENDC}")
+            else:
+                verified = verify_file_integrity(original_hash, output_filename, algorithm, jobs)
+            if not verified:
+                play_sound("error")
+                raise SplitterError(f"Хеш файла '{output_filename}' не совпадает с исходным")
+            if cleanup is None:
+                cleanup = ask_yes_no("Удалить папку с частями после успешного объединения?", default=True)
+            if cleanup:
+                try:
+                    import shutil
+                    shutil.rmtree(parts_folder)
+                    print(f"{Colors.OKGREEN}Папка '{parts_folder}' успешно удалена.{Colors.ENDC}")
+                except Exception as e:
+                    print(f"{Colors.FAIL}Ошибка при удалении папки: {e}{Colors.ENDC}")
         
         play_sound("success")
+        return output_filename
 
+    except SplitterError:
+        if raise_errors:
+            raise
     except Exception as e:
         print(f"{Colors.FAIL}\nПроизошла ошибка при объединении: {e}{Colors.ENDC}")
         play_sound("error")
+        if raise_errors:
+            raise
+
+class ConnectionPool:
+    # Постоянные HTTP/1.1-соединения (keep-alive) к одному серверу: поток берет свободное
+    # соединение или открывает новое, а после полностью прочитанного ответа возвращает его.
+    def __init__(self, url, timeout=TRANSFER_TIMEOUT, blocksize=DEFAULT_BUFFER_SIZE):
+        import urllib.parse
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            raise ValueError(f"Поддерживаются только адреса http:// и https://: '{url}'")
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.prefix = parsed.path.rstrip('/')
+        self.timeout = timeout
+        self.blocksize = blocksize
+        self.idle = []
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def key(self, name):
+        import urllib.parse
+        return f"{self.prefix}/{urllib.parse.quote(name)}"
+
+    def _connect(self):
+        import http.client
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        with self.lock:
+            self.opened += 1
+        return connection_class(self.host, self.port, timeout=self.timeout, blocksize=self.blocksize)
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn
+        except BaseException:
+            # После ошибки состояние соединения неизвестно, в пул оно не возвращается.
+            conn.close()
+            raise
+        with self.lock:
+            self.idle.append(conn)
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle.clear()
+
+class PartTransfer:
+    # Передача частей в S3-совместимое хранилище или на любой HTTP-сервер с PUT и GET:
+    # объект <URL>/<имя файла>. Каждая часть передается и повторяется независимо,
+    # при загрузке S3 сверяет заголовок x-amz-checksum-sha256, при скачивании часть
+    # проверяется хешем из манифеста.
+    def __init__(self, url, connections=TRANSFER_CONNECTIONS, retries=TRANSFER_RETRIES, buffer_size=None,
+                 algorithm='sha256'):
+        from concurrent.futures import ThreadPoolExecutor
+        self.url = url
+        self.connections = max(1, connections)
+        self.retries = max(0, retries)
+        self.buffer_size = buffer_size
+        self.algorithm = algorithm
+        self.pool = ConnectionPool(url, blocksize=len(allocate_buffer(buffer_size)))
+        self.executor = ThreadPoolExecutor(max_workers=self.connections)
+        self.futures = {}
+        self.transferred = 0
+        self.started = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _buffer(self):
+        if not hasattr(self.local, 'buffer'):
+            self.local.buffer = allocate_buffer(self.buffer_size)
+        return self.local.buffer
+
+    def _count(self, n):
+        with self.lock:
+            self.transferred += n
+
+    def retry(self, action, name, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                return action(name, *args)
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise RuntimeError(f"'{name}': {e}") from e
+                delay = TRANSFER_BACKOFF * 2 ** attempt
+                print(f"{Colors.WARNING}Повтор {attempt + 1}/{self.retries} для '{name}' через {delay:.1f} с: "
+                      f"{e}{Colors.ENDC}")
+                time.sleep(delay)
+
+    def submit(self, action, name, *args):
+        with self.lock:
+            if name in self.futures:
+                return
+            if self.started is None:
+                self.started = time.perf_counter()
+            self.futures[name] = self.executor.submit(self.retry, action, name, *args)
+
+    def upload(self, name, path, digest=None):
+        import base64
+        if digest is None:
+            file_hash = new_hasher('sha256')
+            with open(path, 'rb') as f_in:
+                hash_range(f_in, 0, None, [file_hash], self._buffer())
+            digest = file_hash.hexdigest()
+        size = os.path.getsize(path)
+        headers = {'Content-Length': str(size), 'Content-Type': 'application/octet-stream',
+                   'x-amz-checksum-sha256': base64.b64encode(bytes.fromhex(digest)).decode('ascii')}
+        with open(path, 'rb') as f_in, self.pool.connection() as conn:
+            conn.request('PUT', self.pool.key(name), body=f_in, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        if not 200 <= response.status < 300:
+            raise RuntimeError(f"HTTP {response.status} {response.reason}")
+        self._count(size)
+
+    def fetch(self, name):
+        with self.pool.connection() as conn:
+            conn.request('GET', self.pool.key(name))
+            response = conn.getresponse()
+            data = response.read()
+        if response.status == 404:
+            raise FileNotFoundError(f"'{name}' нет на сервере")
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status} {response.reason}")
+        self._count(len(data))
+        return data
+
+    def download(self, name, path, length=None, digest=None, optional=False):
+        hash_func = new_hasher(self.algorithm) if digest and self.algorithm else None
+        tmp_path = path + '.tmp'
+        view = memoryview(self._buffer())
+        received = 0
+        with self.pool.connection() as conn:
+            conn.request('GET', self.pool.key(name))
+            response = conn.getresponse()
+            if response.status != 200:
+                response.read()
+                if response.status == 404 and optional:
+                    return False
+                raise RuntimeError(f"HTTP {response.status} {response.reason}")
+            with open(tmp_path, 'wb') as f_out:
+                for n in iter(lambda: response.readinto(view), 0):
+                    chunk = view[:n]
+                    if hash_func is not None:
+                        hash_func.update(chunk)
+                    f_out.write(chunk)
+                    PROGRESS.advance(n)
+                    received += n
+        if length is not None and received != length:
+            os.remove(tmp_path)
+            raise RuntimeError(f"получено {received} байт вместо {length}")
+        if hash_func is not None and hash_func.hexdigest() != digest:
+            os.remove(tmp_path)
+            raise RuntimeError("хеш не совпадает с манифестом")
+        os.replace(tmp_path, path)
+        self._count(received)
+        return True
+
+    def on_event(self, record):
+        # Подписчик PROGRESS: готовая часть уходит в загрузку сразу, пока пишутся следующие.
+        if record['event'] == 'part' and 'path' in record:
+            digest = (record.get('stored_digest') or record.get('digest')) if self.algorithm == 'sha256' else None
+            self.submit(self.upload, record['name'], record['path'], digest)
+
+    def wait(self):
+        failed = []
+        for name, future in list(self.futures.items()):
+            try:
+                future.result()
+            except Exception as e:
+                failed.append(name)
+                print(f"{Colors.FAIL}✗ {e}{Colors.ENDC}")
+        return failed
+
+    def report(self, action):
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        speed = self.transferred / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+        print(f"{Colors.OKCYAN}{action}:{Colors.ENDC} {format_file_size(self.transferred)} за {elapsed:.2f} с, "
+              f"{speed:.1f} MB/s, соединений {self.connections} (открыто {self.pool.opened})")
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+
+def transfer_objects(manifest):
+    # Все файлы набора частей, кроме манифеста: (имя, длина, хеш, обязателен ли файл).
+    objects = [(p['name'], p.get('stored_length', p['length']), p.get('stored_digest') or p['digest'], True)
+               for p in manifest['parts']]
+    for group in (manifest.get('parity') or {}).get('groups', []):
+        objects.extend((item['name'], group['length'], item['digest'], True) for item in group['parity'])
+    if manifest['split'].get('mode') == 'dir':
+        objects.append((DIR_INDEX_NAME, None, None, True))
+    if manifest.get('algorithm'):
+        objects.append((f"!split_hashes.{manifest['algorithm']}", None, None, False))
+    objects.append(("!split_info.txt", None, None, False))
+    return objects
+
+def check_transfer_name(name):
+    # При скачивании манифест приходит с сервера: имя файла не должно выводить за папку частей.
+    if not name or name in ('.', '..') or os.path.isabs(name) or '/' in name or '\\' in name:
+        raise ValueError(f"Недопустимое имя файла в манифесте: '{name}'")
+    return name
+
+def upload_parts(parts_folder, url, connections=TRANSFER_CONNECTIONS, retries=TRANSFER_RETRIES, buffer_size=None,
+                 transfer=None, raise_errors=False):
+    # Манифест загружается последним: если он есть в хранилище, то набор частей полный.
+    try:
+        manifest = load_manifest(parts_folder)
+        if manifest is None:
+            raise report_error(f"В папке '{parts_folder}' нет манифеста, загружать нечего.")
+        if manifest['split'].get('chunk_store'):
+            raise report_error("Загрузка частей из общего хранилища чанков (--split-cdc) не поддерживается.")
+        if transfer is None:
+            transfer = PartTransfer(url, connections, retries, buffer_size, manifest['algorithm'])
+
+        print(f"{Colors.HEADER}--- Загрузка частей в '{url}' ---{Colors.ENDC}")
+        try:
+            with_digests = manifest['algorithm'] == 'sha256'
+            for name, _, digest, required in transfer_objects(manifest):
+                path = os.path.join(parts_folder, name)
+                if required or os.path.exists(path):
+                    transfer.submit(transfer.upload, name, path, digest if with_digests else None)
+            failed = transfer.wait()
+            if failed:
+                play_sound("error")
+                raise SplitterError(f"Не загружено файлов: {len(failed)}; манифест не загружен")
+            transfer.retry(transfer.upload, MANIFEST_NAME, os.path.join(parts_folder, MANIFEST_NAME))
+        finally:
+            transfer.close()
+
+        print(f"{Colors.OKGREEN}--- Готово! Загружено файлов: {len(transfer.futures) + 1} ---{Colors.ENDC}")
+        transfer.report("Загрузка")
+        play_sound("success")
+        return url
+
+    except SplitterError:
+        if raise_errors:
+            raise
+    except Exception as e:
+        print(f"{Colors.FAIL}\nПроизошла ошибка при загрузке: {e}{Colors.ENDC}")
+        play_sound("error")
+        if raise_errors:
+            raise
+
+def download_parts(url, parts_folder=None, connections=TRANSFER_CONNECTIONS, retries=TRANSFER_RETRIES,
+                   buffer_size=None, raise_errors=False):
+    # Уже скачанные части с верным размером и хешем пропускаются, поэтому прерванное
+    # скачивание можно просто запустить снова.
+    try:
+        transfer = PartTransfer(url, connections, retries, buffer_size)
+        try:
+            print(f"{Colors.HEADER}--- Скачивание частей из '{url}' ---{Colors.ENDC}")
+            data = transfer.retry(transfer.fetch, MANIFEST_NAME)
+            manifest = json.loads(data.decode('utf-8'))
+            if manifest.get('format') != MANIFEST_FORMAT:
+                raise report_error(f"'{MANIFEST_NAME}' на сервере не является манифестом разделения.")
+            if manifest['split'].get('chunk_store'):
+                raise report_error("Скачивание частей из общего хранилища чанков (--split-cdc) не поддерживается.")
+            for name, _, _, _ in transfer_objects(manifest):
+                check_transfer_name(name)
+            if parts_folder is None:
+                original_name = manifest['original_name']
+                if manifest['split'].get('mode') != 'dir':
+                    original_name = os.path.splitext(original_name)[0]
+                parts_folder = f"{check_transfer_name(original_name)}_parts"
+            os.makedirs(parts_folder, exist_ok=True)
+            with open(os.path.join(parts_folder, MANIFEST_NAME), 'wb') as f_manifest:
+                f_manifest.write(data)
+            manifest = load_manifest(parts_folder)
+            transfer.algorithm = manifest['algorithm']
+
+            objects = transfer_objects(manifest)
+            buffer = allocate_buffer(buffer_size)
+            pending = []
+            for name, length, digest, required in objects:
+                path = os.path.join(parts_folder, name)
+                if length is not None and check_part_file(path, length, digest, manifest['algorithm'], True, buffer):
+                    print(f"{Colors.OKBLUE}Часть уже скачана:{Colors.ENDC} '{name}'.")
+                    continue
+                pending.append((name, path, length, digest, not required))
+            total_size = sum(length or 0 for _, _, length, _, _ in pending)
+            print(f"{Colors.OKBLUE}Папка:{Colors.ENDC} '{parts_folder}'")
+            print(f"{Colors.OKBLUE}Файлов к скачиванию:{Colors.ENDC} {len(pending)} ({format_file_size(total_size)})")
+
+            with PROGRESS.operation('download', total_size):
+                download = PROGRESS.bind(transfer.download)
+                for name, path, length, digest, optional in pending:
+                    transfer.submit(download, name, path, length, digest, optional)
+                failed = transfer.wait()
+        finally:
+            transfer.close()
+        if failed:
+            play_sound("error")
+            raise SplitterError(f"Не скачано файлов: {len(failed)}")
+
+        print(f"{Colors.OKGREEN}--- Готово! Части скачаны в '{parts_folder}' ---{Colors.ENDC}")
+        transfer.report("Скачивание")
+        play_sound("success")
+        return parts_folder
+
+    except SplitterError:
+        if raise_errors:
+            raise
+    except Exception as e:
+        print(f"{Colors.FAIL}\nПроизошла ошибка при скачивании: {e}{Colors.ENDC}")
+        play_sound("error")
+        if raise_errors:
+            raise
+
+class ThreadOutput(io.TextIOBase):
+    # Замена sys.stdout на время пакетной обработки: вывод рабочих потоков собирается
+    # в журнал своего задания, а вывод главного потока идет на экран.
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        return (getattr(self.local, 'target', None) or self.stream).write(text)
+
+    def flush(self):
+        (getattr(self.local, 'target', None) or self.stream).flush()
+
+class BatchLimits:
+    # Ограничения пакета: сколько байт файлов обрабатывается одновременно и сколько
+    # заданий одновременно занимают процессор хешированием или сжатием.
+    def __init__(self, io_limit=None, cpu_slots=None):
+        self.io_limit = io_limit
+        self.io_used = 0
+        self.condition = threading.Condition()
+        self.cpu = threading.BoundedSemaphore(cpu_slots) if cpu_slots else None
+
+    @contextlib.contextmanager
+    def acquire(self, size, cpu_heavy=True):
+        # Файл больше лимита все равно запускается, но только когда других заданий нет.
+        need = min(size, self.io_limit) if self.io_limit else 0
+        with self.condition:
+            self.condition.wait_for(lambda: self.io_used == 0 or self.io_used + need <= self.io_limit)
+            self.io_used += need
+        if cpu_heavy and self.cpu is not None:
+            self.cpu.acquire()
+        try:
+            yield
+        finally:
+            if cpu_heavy and self.cpu is not None:
+                self.cpu.release()
+            with self.condition:
+                self.io_used -= need
+                self.condition.notify_all()
+
+def batch_paths(specs, operation):
+    # Источник пакета: папка, шаблон glob или @файл со списком путей (по одному в строке).
+    import glob
+
+    paths = []
+    for spec in specs:
+        if spec.startswith('@'):
+            with open(spec[1:], 'r', encoding='utf-8') as f_list:
+                paths.extend(line.strip() for line in f_list if line.strip())
+        elif os.path.isdir(spec) and operation == 'join' and (spec.rstrip(os.sep).endswith('_parts')
+                                                               or load_manifest(spec) is not None):
+            paths.append(spec)
+        elif os.path.isdir(spec):
+            with os.scandir(spec) as entries:
+                for entry in entries:
+                    if entry.name.startswith('!'):
+                        continue
+                    if operation == 'join' and entry.is_dir() and entry.name.endswith('_parts'):
+                        paths.append(entry.path)
+                    elif operation != 'join' and entry.is_file():
+                        paths.append(entry.path)
+        else:
+            paths.extend(sorted(glob.glob(spec)) or [spec])
+    return list(dict.fromkeys(paths))
+
+def batch_input_size(path, operation):
+    try:
+        if operation != 'join':
+            return os.path.getsize(path)
+        manifest = load_manifest(path)
+        if manifest is not None:
+            return manifest['size']
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    except OSError:
+        return 0
+
+def run_batch(operation, argument, specs, workers=None, io_limit=None, cpu_slots=None, buffer_size=None,
+              algorithm='sha256', jobs=1, resume=False, verify=False, compression=None, level=None, consume=False,
+              parity=0):
+    # Пакетная обработка в одном процессе: задания идут через пул потоков от больших файлов
+    # к меньшим, чтобы самый долгий файл не оказался последним.
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    workers = workers or min(4, os.cpu_count() or 1)
+    tasks = [(path, batch_input_size(path, operation)) for path in batch_paths(specs, operation)]
+    tasks.sort(key=lambda task: task[1], reverse=True)
+    if not tasks:
+        print(f"{Colors.FAIL}Пакет пуст: не найдено ни одного файла.{Colors.ENDC}")
+        play_sound("error")
+        return 1
+
+    total_size = sum(size for _, size in tasks)
+    print(f"{Colors.HEADER}--- Пакетная обработка: {operation} ---{Colors.ENDC}")
+    print(f"{Colors.OKBLUE}Заданий:{Colors.ENDC} {len(tasks)}, всего {format_file_size(total_size)}")
+    print(f"{Colors.OKBLUE}Потоков:{Colors.ENDC} {workers}"
+          + (f", лимит I/O {format_file_size(io_limit)}" if io_limit else "")
+          + (f", слотов CPU {cpu_slots}" if cpu_slots else ""))
+
+    limits = BatchLimits(io_limit, cpu_slots)
+    cpu_heavy = operation == 'join' or bool(algorithm or compression or parity)
+    output = ThreadOutput(sys.stdout)
+
+    def run_task(path, size):
+        log = output.local.target = io.StringIO()
+        started = None
+        try:
+            with limits.acquire(size, cpu_heavy):
+                started = time.perf_counter()
+                if operation == 'split':
+                    result = split_file(path, argument, buffer_size, algorithm, jobs, resume, verify, compression,
+                                        level, consume, parity, raise_errors=True)
+                elif operation == 'split-size':
+                    result = split_by_size(path, argument, buffer_size, algorithm, jobs, resume, verify, compression,
+                                           level, consume, parity, raise_errors=True)
+                else:
+                    manifest = load_manifest(path)
+                    output_filename = None
+                    if manifest is not None:
+                        output_filename = os.path.join(os.path.dirname(path.rstrip(os.sep)), manifest['original_name'])
+                    result = join_files(path, output_filename, buffer_size, jobs, resume, verify, consume,
+                                        cleanup=False, raise_errors=True)
+            error = None
+        except Exception as e:
+            result, error = None, str(e) or type(e).__name__
+        finally:
+            output.local.target = None
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        return {'path': path, 'size': size, 'elapsed': elapsed, 'result': result, 'error': error,
+                'log': log.getvalue()}
+
+    started = time.perf_counter()
+    results = []
+    with contextlib.redirect_stdout(output):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_task, path, size) for path, size in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                status = f"{Colors.OKGREEN}✓" if result['error'] is None else f"{Colors.FAIL}✗"
+                print(f"{status} [{len(results)}/{len(tasks)}] {result['path']}{Colors.ENDC}")
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{Colors.HEADER}--- Итоги пакета ---{Colors.ENDC}")
+    for result in sorted(results, key=lambda r: r['size'], reverse=True):
+        speed = result['size'] / result['elapsed'] / 1024 ** 2 if result['elapsed'] > 0 else 0.0
+        if result['error'] is None:
+            print(f"{Colors.OKGREEN}✓{Colors.ENDC} {result['path']}: {format_file_size(result['size'])} "
+                  f"за {result['elapsed']:.2f} с, {speed:.1f} MB/s")
+        else:
+            print(f"{Colors.FAIL}✗ {result['path']}: {result['error']}{Colors.ENDC}")
+            # Для упавшего задания показываем конец его вывода: там видно, на каком шаге оно остановилось.
+            lines = [line for line in result['log'].splitlines() if line.strip()][-BATCH_LOG_TAIL:]
+            for line in lines:
+                print(f"    {line}")
+    failed = sum(1 for r in results if r['error'] is not None)
+    speed = total_size / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+    print(f"{Colors.OKCYAN}Всего:{Colors.ENDC} {len(results)} заданий, {format_file_size(total_size)} "
+          f"за {elapsed:.2f} с ({speed:.1f} MB/s), ошибок: {failed}")
+    play_sound("success" if not failed else "error")
+    return failed
 
 def show_help():
     print(f"""
@@ -388,7 +3083,8 @@ def show_help():
 {Colors.BOLD}Особенности:{Colors.ENDC}
   • Автоматическое перемещение исходного файла в папку с частями
   • Автоматическое определение имени файла при объединении
-  • Проверка целостности файлов с помощью SHA-256
+  • Проверка целостности файлов с помощью SHA-256 (хеш считается за тот же проход, что и разделение)
+  • Хеши каждой части в файле !split_hashes.sha256
   • Создание информационных файлов для легкого восстановления
   • Поддержка больших файлов (до нескольких терабайт)
 
@@ -397,34 +3093,169 @@ def show_help():
   KB - килобайты (1024 байта)
   MB - мегабайты (1048576 байт)
   GB - гигабайты (1073741824 байта)
+  TB - терабайты (1099511627776 байт)
+
+{Colors.BOLD}Параметры командной строки:{Colors.ENDC}
+  --buffer <размер>  Размер буфера копирования (по умолчанию 1MB, максимум 64MB).
+                     Части копируются потоково: объем памяти не зависит от размера части.
+  --no-hash          Не вычислять хеши (быстрее, копирование идет напрямую через ядро).
+  --jobs N           Создавать N частей одновременно (для NVMe и RAID). Результат
+                     побайтно совпадает с последовательным разделением.
+                     При объединении части копируются параллельно в заранее
+                     выделенный файл, хеш каждой части проверяется на лету.
+  --resume           Продолжить прерванное разделение или объединение по журналу
+                     в папке с частями. Готовые части проверяются по размеру.
+  --resume=verify    То же, но готовые части дополнительно проверяются по хешу.
+  --compress <алг>   Сжимать каждую часть при записи: zlib (.gz), lzma (.xz) или bz2 (.bz2).
+                     С --jobs N несколько частей сжимаются одновременно. При объединении
+                     части распаковываются автоматически.
+  --level N          Уровень сжатия (zlib 0-9, lzma 0-9, bz2 1-9).
+  --hash-algo <алг>  sha256 (по умолчанию, совместим со старыми !split_info.txt),
+                     tree-sha256 или tree-blake2b — дерево хешей над блоками
+                     (--leaf-size, по умолчанию 4MB). Блоки считаются на всех ядрах,
+                     а хеши частей и общий хеш получаются из одних и тех же блоков.
+  --consume          Разрушающий режим для почти заполненного диска: при разделении
+                     части вырезаются с конца исходного файла и он укорачивается,
+                     при объединении каждая часть удаляется сразу после проверки.
+                     Лишнее место — не больше одной части; после сбоя --resume.
+  -                  Вместо файла: --split-size - <имя> <размер> читает stdin,
+                     --join <папка> - пишет результат в stdout (сообщения — в stderr).
+  --batch <команда>  Пакетная обработка многих файлов в одном процессе: split, split-size
+                     или join, затем папки, шаблоны glob или @файл со списком путей.
+                     --workers N — файлов одновременно, --io-limit <размер> — сколько
+                     байт файлов в работе одновременно, --cpu-slots N — сколько заданий
+                     одновременно хешируют и сжимают. Большие файлы запускаются первыми.
+  --quiet            Вывод без ANSI-цветов, котиков и звуковых сигналов.
+  --progress=json    Писать в stderr события хода работы построчно в JSON: начало,
+                     прогресс раз в секунду (байты, MB/s, ETA) и завершение.
+  --profile          После операции показать время по стадиям: чтение, хеширование,
+                     запись, копирование ядром (при --jobs время суммируется по потокам).
+                     --profile=cprofile — отчет cProfile по функциям в stderr.
+  --parity K         Добавить K частей четности (код Рида-Соломона) на каждую группу
+                     до 256-K частей. При объединении части проверяются по хешам,
+                     и до K отсутствующих или поврежденных частей группы восстанавливаются.
+
+{Colors.BOLD}Упаковка папки в тома (--split-dir):{Colors.ENDC}
+  --split-dir <папка> <размер_тома> за один проход обходит дерево и пишет файлы
+  подряд в тома фиксированного размера (файл может переходить в следующий том),
+  без промежуточного tar-архива. Индекс !split_index.json хранит для каждого файла
+  тома, смещения, длину, права, время изменения и SHA-256.
+  --join <папка_с_томами> [куда] восстанавливает все дерево (--jobs N — в N потоков),
+  --extract <папка_с_томами> <путь> [куда] — один файл или подпапку, читая только
+  тома, в которых они лежат.
+
+{Colors.BOLD}Загрузка в хранилище (--upload, --download):{Colors.ENDC}
+  --upload <URL> <папка_с_частями> загружает части PUT-запросами в <URL>/<имя части>
+  (S3-совместимое хранилище или любой HTTP-сервер) и последним — манифест.
+  Вместе с --split, --split-size или --split-dir каждая часть загружается сразу
+  после записи. --download <URL> [папка] скачивает манифест и части и проверяет
+  их хеши. --connections N — параллельных keep-alive соединений (по умолчанию 4),
+  --retries N — повторов для каждой части (по умолчанию 3).
+
+{Colors.BOLD}Разделение по содержимому (--split-cdc):{Colors.ENDC}
+  Границы чанков определяются содержимым (Gear/FastCDC), поэтому вставка байта
+  меняет только соседние чанки. Чанки хранятся один раз в общем хранилище
+  (--chunk-store, по умолчанию chunk_store рядом с файлом) под именем своего
+  SHA-256, а папка _parts содержит только манифест. Средний размер чанка по
+  умолчанию 1MB, --cdc-min и --cdc-max задают границы (avg/4 и avg*4).
 
 {Colors.OKGREEN}Примечание: Исходный файл сохраняется в папке с частями для безопасности!{Colors.ENDC}
 """)
 
-def list_files_in_current_dir():
-    files = [f for f in os.listdir('.') if os.path.isfile(f) and not f.startswith('.')]
-    if files:
-        print(f"\n{Colors.OKBLUE}Файлы в текущей папке:{Colors.ENDC}")
-        for i, f in enumerate(sorted(files), 1):
-            size = os.path.getsize(f)
-            print(f"  {i:2d}. {f} ({format_file_size(size)})")
-    return files
-
-def list_folders_in_current_dir():
-    folders = [f for f in os.listdir('.') if os.path.isdir(f) and not f.startswith('.')]
-    if folders:
-        print(f"\n{Colors.OKBLUE}Папки в текущей папке:{Colors.ENDC}")
-        for i, f in enumerate(sorted(folders), 1):
-            print(f"  {i:2d}. {f}/")
-    return folders
+class DirectoryBrowser:
+    # Содержимое папки читается одним проходом os.scandir и хранится, пока не изменится
+    # mtime папки (добавление, удаление, переименование). Размер файла запрашивается только
+    # для строк на экране и дальше берется из кэша DirEntry.
+    def __init__(self, path='.', page_size=BROWSER_PAGE_SIZE):
+        self.path = path
+        self.page_size = page_size
+        self.page = 0
+        self.pattern = ''
+        self._mtime = None
+        self._entries = []
+        self._visible_key = None
+        self._visible = []
+
+    def entries(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            with os.scandir(self.path) as it:
+                entries = [entry for entry in it if not entry.name.startswith('.')]
+            entries.sort(key=lambda entry: (not entry.is_dir(), entry.name))
+            self._entries, self._mtime = entries, mtime
+        return self._entries
+
+    def visible(self):
+        entries = self.entries()
+        key = (self._mtime, self.pattern)
+        if key == self._visible_key:
+            return self._visible
+        pattern = self.pattern.lower()
+        if not pattern:
+            visible = entries
+        elif any(c in pattern for c in '*?['):
+            import fnmatch
+            visible = [entry for entry in entries if fnmatch.fnmatch(entry.name.lower(), pattern)]
+        else:
+            visible = [entry for entry in entries if pattern in entry.name.lower()]
+        self._visible, self._visible_key = visible, key
+        return visible
+
+    def show(self):
+        entries = self.visible()
+        if not entries:
+            if self.pattern:
+                print(f"\n{Colors.WARNING}Ничего не найдено по фильтру '{self.pattern}'.{Colors.ENDC}")
+            return
+        pages = -(-len(entries) // self.page_size)
+        self.page = max(0, min(self.page, pages - 1))
+        start = self.page * self.page_size
+        print(f"\n{Colors.OKBLUE}Содержимое текущей папки:{Colors.ENDC}")
+        for i, entry in enumerate(entries[start:start + self.page_size], start + 1):
+            if entry.is_dir():
+                print(f"  {i:4d}. {entry.name}/")
+                continue
+            try:
+                size = format_file_size(entry.stat().st_size)
+            except OSError:
+                size = "?"
+            print(f"  {i:4d}. {entry.name} ({size})")
+        footer = f"Страница {self.page + 1} из {pages}, всего {len(entries)}"
+        if self.pattern:
+            footer += f", фильтр '{self.pattern}'"
+        print(f"  {Colors.OKCYAN}{footer}{Colors.ENDC}")
+
+    def command(self, text):
+        # n/p — листать страницы, /текст — фильтр по подстроке или шаблону (*.sql), / — сбросить.
+        text = text.strip()
+        if text in ('n', 'N'):
+            self.page += 1
+        elif text in ('p', 'P'):
+            self.page = max(0, self.page - 1)
+        elif text.startswith('/'):
+            self.pattern = text[1:].strip()
+            self.page = 0
+        else:
+            return False
+        return True
+
+    def resolve(self, text):
+        # Номер из списка превращается в имя; все остальное считается путем.
+        text = text.strip()
+        if text.isdigit():
+            entries = self.visible()
+            if 1 <= int(text) <= len(entries):
+                name = entries[int(text) - 1].name
+                return name if self.path == '.' else os.path.join(self.path, name)
+        return text
 
 def main_menu():
+    browser = DirectoryBrowser('.')
     while True:
         print(get_random_cat_art())
         print(f"{Colors.HEADER}=== Мяу-Разделитель Файлов ==={Colors.ENDC}")
         
-        list_files_in_current_dir()
-        list_folders_in_current_dir()
+        browser.show()
         
         print(f"\n{Colors.BOLD}Выберите действие:{Colors.ENDC}")
         print(f"  1. Разделить файл на N частей")
@@ -433,19 +3264,23 @@ def main_menu():
         print(f"  4. Справка")
         print(f"  5. Выход")
         
+        print(f"  n/p — следующая/предыдущая страница, /текст — фильтр, / — сбросить фильтр")
+        
         choice = input(f"\n{Colors.BOLD}Ваш выбор (1-5): {Colors.ENDC}")
         play_sound("select")
         
-        if choice == '1':
-            filename = input(f"{Colors.BOLD}Введите имя файла для разделения: {Colors.ENDC}")
+        if browser.command(choice):
+            continue
+        elif choice == '1':
+            filename = browser.resolve(input(f"{Colors.BOLD}Введите имя или номер файла для разделения: {Colors.ENDC}"))
             parts = input(f"{Colors.BOLD}На сколько частей разделить файл? {Colors.ENDC}")
             split_file(filename, parts)
         elif choice == '2':
-            filename = input(f"{Colors.BOLD}Введите имя файла для разделения: {Colors.ENDC}")
+            filename = browser.resolve(input(f"{Colors.BOLD}Введите имя или номер файла для разделения: {Colors.ENDC}"))
             chunk_size = input(f"{Colors.BOLD}Размер части (например, 10MB, 500KB, 1GB): {Colors.ENDC}")
             split_by_size(filename, chunk_size)
         elif choice == '3':
-            folder = input(f"{Colors.BOLD}Введите папку с частями файла: {Colors.ENDC}")
+            folder = browser.resolve(input(f"{Colors.BOLD}Введите папку с частями или ее номер: {Colors.ENDC}"))
             output = input(f"{Colors.BOLD}Введите имя результирующего файла (Enter для автоопределения): {Colors.ENDC}")
             if output.strip() == "":
                 join_files(folder)
@@ -465,23 +3300,183 @@ def main_menu():
         
         input(f"\n{Colors.OKBLUE}Нажмите Enter, чтобы продолжить...{Colors.ENDC}")
 
+def pop_option(args, name, default=None, flag=False):
+    for i, arg in enumerate(args):
+        if arg == name:
+            del args[i]
+            if flag:
+                return True
+            if i >= len(args):
+                raise ValueError(f"Не указано значение для '{name}'")
+            return args.pop(i)
+        if not flag and arg.startswith(name + '='):
+            del args[i]
+            return arg[len(name) + 1:]
+    return False if flag else default
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--split" and len(sys.argv) >= 4:
-            split_file(sys.argv[2], sys.argv[3])
-        elif sys.argv[1] == "--split-size" and len(sys.argv) >= 4:
-            split_by_size(sys.argv[2], sys.argv[3])
-        elif sys.argv[1] == "--join" and len(sys.argv) >= 3:
-            output_file = sys.argv[3] if len(sys.argv) >= 4 else None
-            join_files(sys.argv[2], output_file)
-        elif sys.argv[1] == "--help":
+    args = sys.argv[1:]
+    try:
+        if pop_option(args, '--quiet', flag=True):
+            set_quiet()
+        progress = pop_option(args, '--progress')
+        if progress is not None:
+            if progress != 'json':
+                raise ValueError("Поддерживается только --progress=json")
+            PROGRESS.subscribe(json_progress_writer(sys.stderr))
+        if pop_option(args, '--profile=cprofile', flag=True):
+            import atexit
+            import cProfile
+            import pstats
+
+            profiler = cProfile.Profile()
+
+            def dump_profile():
+                profiler.disable()
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(30)
+
+            atexit.register(dump_profile)
+            profiler.enable()
+        elif pop_option(args, '--profile', flag=True):
+            PROGRESS.timing = True
+            PROGRESS.subscribe(print_profile)
+        buffer_size = pop_option(args, '--buffer')
+        if buffer_size is not None:
+            buffer_size = parse_size(buffer_size)
+        algorithm = pop_option(args, '--hash-algo', 'sha256')
+        if algorithm not in ('sha256', 'tree-sha256', 'tree-blake2b'):
+            raise ValueError("Алгоритм хеширования должен быть одним из: sha256, tree-sha256, tree-blake2b")
+        leaf_size = pop_option(args, '--leaf-size')
+        if leaf_size is not None:
+            leaf_size = parse_size(leaf_size)
+            if is_tree_algorithm(algorithm):
+                algorithm = f"{algorithm}:{leaf_size}"
+        if pop_option(args, '--no-hash', flag=True):
+            algorithm = None
+        verify = pop_option(args, '--resume=verify', flag=True)
+        resume = pop_option(args, '--resume', flag=True) or verify
+        jobs = int(pop_option(args, '--jobs', 1))
+        compression = pop_option(args, '--compress')
+        level = pop_option(args, '--level')
+        level = int(level) if level is not None else None
+        check_compression(compression, level)
+        chunk_store = pop_option(args, '--chunk-store')
+        cdc_min = pop_option(args, '--cdc-min')
+        cdc_max = pop_option(args, '--cdc-max')
+        consume = pop_option(args, '--consume', flag=True)
+        parity = int(pop_option(args, '--parity', 0))
+        workers = pop_option(args, '--workers')
+        workers = int(workers) if workers is not None else None
+        io_limit = pop_option(args, '--io-limit')
+        io_limit = parse_size(io_limit) if io_limit is not None else None
+        cpu_slots = pop_option(args, '--cpu-slots')
+        cpu_slots = int(cpu_slots) if cpu_slots is not None else None
+        upload_url = pop_option(args, '--upload')
+        download_url = pop_option(args, '--download')
+        connections = int(pop_option(args, '--connections', TRANSFER_CONNECTIONS))
+        retries = int(pop_option(args, '--retries', TRANSFER_RETRIES))
+        if connections <= 0:
+            raise ValueError("Количество соединений должно быть больше нуля")
+        if not 0 <= parity <= PARITY_MAX_K:
+            raise ValueError(f"Количество частей четности должно быть от 0 до {PARITY_MAX_K}")
+        if jobs <= 0:
+            raise ValueError("Количество потоков должно быть больше нуля")
+    except ValueError as e:
+        print(f"{Colors.FAIL}Ошибка в параметрах: {e}{Colors.ENDC}")
+        sys.exit(1)
+
+    # С --upload части команды разделения загружаются по мере готовности.
+    transfer = None
+    folder = None
+    if upload_url and args and args[0] in ('--split', '--split-size', '--split-dir'):
+        try:
+            transfer = PartTransfer(upload_url, connections, retries, buffer_size, algorithm)
+        except ValueError as e:
+            print(f"{Colors.FAIL}Ошибка в параметрах: {e}{Colors.ENDC}")
+            sys.exit(1)
+        PROGRESS.subscribe(transfer.on_event)
+
+    if download_url:
+        if not download_parts(download_url, args[0] if args else None, connections, retries, buffer_size):
+            sys.exit(1)
+    elif len(args) > 0:
+        if args[0] == "--split" and len(args) >= 3:
+            folder = split_file(args[1], args[2], buffer_size=buffer_size, algorithm=algorithm, jobs=jobs,
+                                resume=resume, verify=verify, compression=compression, level=level, consume=consume,
+                                parity=parity)
+        elif args[0] == "--split-size" and args[1:2] == ['-'] and len(args) >= 4:
+            folder = split_stream(args[2], args[3], buffer_size=buffer_size, algorithm=algorithm,
+                                  compression=compression, level=level, parity=parity)
+        elif args[0] == "--split-size" and len(args) >= 3:
+            folder = split_by_size(args[1], args[2], buffer_size=buffer_size, algorithm=algorithm, jobs=jobs,
+                                   resume=resume, verify=verify, compression=compression, level=level, consume=consume,
+                                   parity=parity)
+        elif args[0] == "--split-cdc" and len(args) >= 2:
+            split_cdc(args[1], chunk_store, args[2] if len(args) >= 3 else None, cdc_min, cdc_max, buffer_size)
+        elif args[0] == "--split-dir" and len(args) >= 3:
+            folder = split_directory(args[1], args[2], buffer_size=buffer_size, algorithm=algorithm, parity=parity)
+        elif args[0] == "--extract" and len(args) >= 3:
+            restore_directory(args[1], args[3] if len(args) >= 4 else None, buffer_size=buffer_size, jobs=jobs,
+                              only=args[2])
+        elif args[0] == "--join" and len(args) >= 2:
+            output_file = args[2] if len(args) >= 3 else None
+            if output_file == '-':
+                # Данные идут в stdout, поэтому все сообщения (и звуковые сигналы) — в stderr.
+                stdout = sys.stdout.buffer
+                with contextlib.redirect_stdout(sys.stderr):
+                    ok = join_files(args[1], output_file, buffer_size=buffer_size, stream=stdout)
+                if not ok:
+                    sys.exit(1)
+            else:
+                join_files(args[1], output_file, buffer_size=buffer_size, jobs=jobs, resume=resume, verify=verify,
+                           consume=consume)
+        elif args[0] == "--checksum" and len(args) >= 2:
+            checksum_algorithm = args[2] if len(args) >= 3 else (algorithm or 'sha256')
+            if leaf_size is not None and is_tree_algorithm(checksum_algorithm) and ':' not in checksum_algorithm:
+                checksum_algorithm = f"{checksum_algorithm}:{leaf_size}"
+            checksum = calculate_file_hash(args[1], checksum_algorithm, buffer_size, jobs)
+            if checksum:
+                print(f"{checksum}  {args[1]}")
+        elif args[0] == "--batch" and len(args) >= 3 and args[1] in ('split', 'split-size', 'join'):
+            if args[1] == 'join':
+                argument, specs = None, args[2:]
+            else:
+                argument, specs = args[2], args[3:]
+            failed = run_batch(args[1], argument, specs, workers, io_limit, cpu_slots, buffer_size, algorithm, jobs,
+                               resume, verify, compression, level, consume, parity)
+            if failed:
+                sys.exit(1)
+        elif upload_url and len(args) == 1:
+            if not upload_parts(args[0], upload_url, connections, retries, buffer_size):
+                sys.exit(1)
+        elif args[0] == "--help":
             show_help()
         else:
             print(f"{Colors.FAIL}Неверные аргументы командной строки.{Colors.ENDC}")
             print(f"Использование:")
-            print(f"  {sys.argv[0]} --split <файл> <количество_частей>")
-            print(f"  {sys.argv[0]} --split-size <файл> <размер_части>")
-            print(f"  {sys.argv[0]} --join <папка_с_частями> [результирующий_файл]")
+            print(f"  {sys.argv[0]} --split <файл> <количество_частей> [--buffer <размер>] [--no-hash] [--jobs N] [--resume] [--compress zlib|lzma|bz2] [--level N] [--hash-algo <алг>] [--consume] [--parity K]")
+            print(f"  {sys.argv[0]} --split-size <файл> <размер_части> [--buffer <размер>] [--no-hash] [--jobs N] [--resume] [--compress zlib|lzma|bz2] [--level N] [--hash-algo <алг>] [--consume] [--parity K]")
+            print(f"  {sys.argv[0]} --split-size - <имя_файла> <размер_части> [--buffer <размер>] [--compress zlib|lzma|bz2] [--hash-algo <алг>]")
+            print(f"  {sys.argv[0]} --split-cdc <файл> [средний_размер] [--chunk-store <папка>] [--cdc-min <размер>] [--cdc-max <размер>]")
+            print(f"  {sys.argv[0]} --join <папка_с_частями> [результирующий_файл] [--buffer <размер>] [--jobs N] [--resume] [--consume]")
+            print(f"  {sys.argv[0]} --join <папка_с_частями> - > файл   (вывод в stdout)")
+            print(f"  {sys.argv[0]} --split-dir <папка> <размер_тома> [--buffer <размер>] [--no-hash] [--parity K]")
+            print(f"  {sys.argv[0]} --extract <папка_с_томами> <путь_в_архиве> [папка_назначения]")
+            print(f"  {sys.argv[0]} --batch split-size <размер_части> <папка|шаблон|@список>... [--workers N] [--io-limit <размер>] [--cpu-slots N]")
+            print(f"  {sys.argv[0]} --batch split <количество_частей> <папка|шаблон|@список>... [--workers N]")
+            print(f"  {sys.argv[0]} --batch join <папка|шаблон|@список>... [--workers N]")
+            print(f"  {sys.argv[0]} --upload <URL> <папка_с_частями> [--connections N] [--retries N]")
+            print(f"  {sys.argv[0]} --split-size <файл> <размер_части> --upload <URL>   (загрузка по мере разделения)")
+            print(f"  {sys.argv[0]} --download <URL> [папка_с_частями] [--connections N] [--retries N]")
+            print(f"  {sys.argv[0]} --checksum <файл> [sha256|tree-sha256|tree-blake2b] [--leaf-size <размер>] [--jobs N]")
             print(f"  {sys.argv[0]} --help")
+            print(f"Общие параметры: [--quiet] [--progress=json] [--profile | --profile=cprofile]")
     else:
-        main_menu()
\ No newline at end of file
+        main_menu()
+
+    if transfer is not None:
+        if folder is None:
+            transfer.close()
+            sys.exit(1)
+        if not upload_parts(folder, upload_url, buffer_size=buffer_size, transfer=transfer):
+            sys.exit(1)
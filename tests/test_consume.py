@@ -0,0 +1,180 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import main
+
+main.set_quiet()
+
+SOURCE_SIZE = 3 * 1024 * 1024 + 12345
+
+class InjectedCrash(Exception):
+    pass
+
+def crash_after_parts(count):
+    # Запись о части уже в журнале, но исходный файл еще не укорочен (или часть не удалена).
+    append = main.Journal.append
+    written = []
+
+    def crashing_append(journal, record):
+        append(journal, record)
+        if record.get('event') == 'part':
+            written.append(record)
+            if len(written) == count:
+                raise InjectedCrash(f"сбой после {count}-й части")
+    return mock.patch.object(main.Journal, 'append', crashing_append)
+
+class ConsumeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='db-divider-test-')
+        self.source = os.path.join(self.workdir, 'source.bin')
+        self.parts_folder = os.path.join(self.workdir, 'source_parts')
+        self.data = os.urandom(SOURCE_SIZE)
+        with open(self.source, 'wb') as f_out:
+            f_out.write(self.data)
+        self.quiet = contextlib.redirect_stdout(open(os.devnull, 'w'))
+        self.quiet.__enter__()
+
+    def tearDown(self):
+        self.quiet.__exit__(None, None, None)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def split(self, parts='4', **kwargs):
+        return main.split_file(self.source, parts, raise_errors=True, **kwargs)
+
+    def join(self, output='joined.bin', **kwargs):
+        output_path = os.path.join(self.workdir, output)
+        main.join_files(self.parts_folder, output_path, cleanup=False, raise_errors=True, **kwargs)
+        return output_path
+
+    def read(self, path):
+        with open(path, 'rb') as f_in:
+            return f_in.read()
+
+    def part_files(self):
+        return sorted(f for f in os.listdir(self.parts_folder) if '_part_' in f)
+
+class ConsumeSplitTest(ConsumeTestCase):
+    def journal_path(self):
+        return os.path.join(self.parts_folder, main.SPLIT_JOURNAL_NAME)
+
+    def crash_split(self, count=2):
+        with crash_after_parts(count), self.assertRaises(InjectedCrash):
+            self.split(consume=True)
+
+    def test_round_trip(self):
+        self.split(consume=True)
+        self.assertFalse(os.path.exists(self.source))
+        self.assertFalse(os.path.exists(os.path.join(self.parts_folder, 'source.bin')))
+        self.assertFalse(os.path.exists(self.journal_path()))
+        self.assertEqual(len(self.part_files()), 4)
+        self.assertEqual(self.read(self.join()), self.data)
+
+    def test_resume_after_crash_before_truncate(self):
+        self.crash_split()
+        # Части 4 и 3 записаны и отмечены в журнале, но часть 3 еще не вырезана из исходного файла.
+        moved_source = os.path.join(self.parts_folder, 'source.bin')
+        self.assertGreater(os.path.getsize(moved_source), SOURCE_SIZE // 2)
+        self.split(consume=True, resume=True)
+        self.assertFalse(os.path.exists(moved_source))
+        self.assertEqual(self.read(self.join()), self.data)
+
+    def test_refuses_run_without_resume(self):
+        self.crash_split()
+        journal = self.read(self.journal_path())
+        with self.assertRaises(main.SplitterError):
+            self.split(consume=True)
+        with self.assertRaises(main.SplitterError):
+            self.split()
+        self.assertEqual(self.read(self.journal_path()), journal)
+        self.split(consume=True, resume=True)
+        self.assertEqual(self.read(self.join()), self.data)
+
+    def test_refuses_mismatched_resume(self):
+        self.crash_split()
+        journal = self.read(self.journal_path())
+        with self.assertRaises(main.SplitterError):
+            self.split('5', consume=True, resume=True)
+        with self.assertRaises(main.SplitterError):
+            self.split(consume=True, resume=True, algorithm='md5')
+        self.assertEqual(self.read(self.journal_path()), journal)
+        self.split(consume=True, resume=True)
+        self.assertEqual(self.read(self.join()), self.data)
+
+    def test_crash_while_rewriting_journal_on_resume(self):
+        self.crash_split()
+        journal = self.read(self.journal_path())
+        with mock.patch.object(main.os, 'replace', side_effect=InjectedCrash("сбой при перезаписи журнала")):
+            with self.assertRaises(InjectedCrash):
+                self.split(consume=True, resume=True)
+        self.assertEqual(self.read(self.journal_path()), journal)
+        self.split(consume=True, resume=True)
+        self.assertEqual(self.read(self.join()), self.data)
+
+    def test_crash_during_resume_keeps_earlier_records(self):
+        self.crash_split(1)
+        with crash_after_parts(1), self.assertRaises(InjectedCrash):
+            self.split(consume=True, resume=True)
+        self.assertEqual(len(main.Journal(self.journal_path()).load()), 4)
+        self.split(consume=True, resume=True)
+        self.assertEqual(self.read(self.join()), self.data)
+
+class ConsumeJoinTest(ConsumeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.split()
+        self.output = os.path.join(self.workdir, 'joined.bin')
+
+    def journal_path(self):
+        return os.path.join(self.parts_folder, main.JOIN_JOURNAL_NAME)
+
+    def crash_join(self, count=2):
+        with crash_after_parts(count), self.assertRaises(InjectedCrash):
+            self.join(consume=True)
+
+    def test_round_trip(self):
+        self.assertEqual(self.read(self.join(consume=True)), self.data)
+        self.assertEqual(self.part_files(), [])
+        self.assertFalse(os.path.exists(self.journal_path()))
+
+    def test_resume_after_crash_before_part_removal(self):
+        self.crash_join()
+        # Часть 2 уже дописана и отмечена в журнале, но еще не удалена.
+        self.assertEqual(self.part_files(), ['source_part_002.bin', 'source_part_003.bin', 'source_part_004.bin'])
+        self.assertEqual(self.read(self.join(consume=True, resume=True)), self.data)
+        self.assertEqual(self.part_files(), [])
+
+    def test_refuses_run_without_resume(self):
+        self.crash_join()
+        journal = self.read(self.journal_path())
+        with self.assertRaises(main.SplitterError):
+            self.join(consume=True)
+        self.assertEqual(self.read(self.journal_path()), journal)
+        self.assertEqual(self.read(self.join(consume=True, resume=True)), self.data)
+
+    def test_refuses_mismatched_resume(self):
+        self.crash_join()
+        journal = self.read(self.journal_path())
+        with self.assertRaises(main.SplitterError):
+            self.join('other.bin', consume=True, resume=True)
+        self.assertEqual(self.read(self.journal_path()), journal)
+        self.assertFalse(os.path.exists(os.path.join(self.workdir, 'other.bin')))
+        self.assertEqual(self.read(self.join(consume=True, resume=True)), self.data)
+
+    def test_crash_while_rewriting_journal_on_resume(self):
+        self.crash_join()
+        journal = self.read(self.journal_path())
+        with mock.patch.object(main.os, 'replace', side_effect=InjectedCrash("сбой при перезаписи журнала")):
+            with self.assertRaises(InjectedCrash):
+                self.join(consume=True, resume=True)
+        self.assertEqual(self.read(self.journal_path()), journal)
+        self.assertEqual(self.read(self.join(consume=True, resume=True)), self.data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import main
+
+SOURCE_SIZE = 256 * 1024 * 1024
+BUFFER_SIZE = 1024 * 1024
+# Кроме буфера копирования в пике живут хеш-объекты, манифест и запас аллокатора.
+RSS_SLACK = 16 * 1024 * 1024
+
+# Выполняется в отдельном процессе, чтобы пиковая память относилась только к операции.
+MEASURE = r'''
+import os, sys, json, resource, contextlib
+sys.path.insert(0, sys.argv[1])
+import main
+workdir, op, buffer_size = sys.argv[2], sys.argv[3], int(sys.argv[4])
+os.chdir(workdir)
+main.set_quiet()
+
+def peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+before = peak_rss()
+with contextlib.redirect_stdout(open(os.devnull, 'w')):
+    if op == 'split':
+        main.split_file('source.bin', '4', buffer_size=buffer_size, raise_errors=True)
+    elif op == 'split-size':
+        main.split_by_size('source.bin', '64MB', buffer_size=buffer_size, raise_errors=True)
+    else:
+        main.join_files('source_parts', 'joined.bin', buffer_size=buffer_size, cleanup=False, raise_errors=True)
+print(json.dumps({'before': before, 'after': peak_rss()}))
+'''
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "пиковая память замеряется через getrusage в Linux")
+class PeakMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='db-divider-test-')
+        with open(os.path.join(self.workdir, 'source.bin'), 'wb') as f_out:
+            f_out.truncate(SOURCE_SIZE)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def measure(self, op):
+        completed = subprocess.run([sys.executable, '-c', MEASURE, ROOT, self.workdir, op, str(BUFFER_SIZE)],
+                                   capture_output=True, text=True)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        result = json.loads(completed.stdout.splitlines()[-1])
+        return result['after'] - result['before']
+
+    def assert_bounded(self, op):
+        growth = self.measure(op)
+        bound = 2 * len(main.allocate_buffer(BUFFER_SIZE)) + RSS_SLACK
+        self.assertLess(growth, bound, f"{op}: пиковая память выросла на {growth} байт, предел {bound}")
+
+    def test_split_and_join_stay_within_buffer_bound(self):
+        self.assert_bounded('split')
+        self.assert_bounded('join')
+        self.assertEqual(os.path.getsize(os.path.join(self.workdir, 'joined.bin')), SOURCE_SIZE)
+
+    def test_split_by_size_stays_within_buffer_bound(self):
+        self.assert_bounded('split-size')
+
+class AllocateBufferTest(unittest.TestCase):
+    def test_buffer_size_is_clamped(self):
+        self.assertEqual(len(main.allocate_buffer(1)), main.MIN_BUFFER_SIZE)
+        self.assertEqual(len(main.allocate_buffer(10 * 1024 ** 3)), main.MAX_BUFFER_SIZE)
+        self.assertEqual(len(main.allocate_buffer()), main.DEFAULT_BUFFER_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
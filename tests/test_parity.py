@@ -0,0 +1,143 @@
+import os
+import sys
+import shutil
+import random
+import tempfile
+import unittest
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import main
+
+main.set_quiet()
+
+class GF256Test(unittest.TestCase):
+    def setUp(self):
+        self.gf = main.GF256()
+
+    def test_every_nonzero_element_has_inverse(self):
+        for a in range(1, 256):
+            self.assertEqual(self.gf.mul(a, self.gf.inverse(a)), 1)
+
+    def test_square_cauchy_submatrix_is_invertible(self):
+        gf = self.gf
+        matrix = gf.cauchy(4, 6)
+        square = [[matrix[r][c] for c in (1, 4, 5)] for r in (0, 2, 3)]
+        inverse = gf.invert(square)
+        for i in range(3):
+            for j in range(3):
+                value = 0
+                for m in range(3):
+                    value ^= gf.mul(square[i][m], inverse[m][j])
+                self.assertEqual(value, int(i == j))
+
+    def test_add_scaled_matches_without_numpy(self):
+        plain = main.GF256()
+        plain.np = None
+        block = bytes(random.Random(1).randrange(256) for _ in range(1000))
+        for gf in (self.gf, plain):
+            acc = gf.add_scaled(gf.zeros(1200), 1, block)
+            acc = gf.add_scaled(acc, 0x53, block[:700])
+            expected = bytes(v ^ self.gf.mul(0x53, v) if i < 700 else v for i, v in enumerate(block)) + bytes(200)
+            self.assertEqual(gf.to_bytes(acc, 1200), expected)
+
+    def test_groups_cover_all_parts(self):
+        groups = main.parity_groups(300, 2)
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(sum(groups, []), list(range(300)))
+        self.assertTrue(all(len(g) + 2 <= 256 for g in groups))
+        self.assertEqual(main.parity_groups(0, 2), [])
+
+class RepairTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='db-divider-test-')
+        self.source = os.path.join(self.workdir, 'source.bin')
+        self.parts_folder = os.path.join(self.workdir, 'source_parts')
+        self.quiet = contextlib.redirect_stdout(open(os.devnull, 'w'))
+        self.quiet.__enter__()
+
+    def tearDown(self):
+        self.quiet.__exit__(None, None, None)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def split(self, data, parts, parity, **kwargs):
+        self.data = data
+        with open(self.source, 'wb') as f_out:
+            f_out.write(data)
+        main.split_file(self.source, str(parts), parity=parity, raise_errors=True, **kwargs)
+        self.manifest = main.load_manifest(self.parts_folder)
+
+    def path(self, name):
+        return os.path.join(self.parts_folder, name)
+
+    def part_name(self, index):
+        return next(p['name'] for p in self.manifest['parts'] if p['index'] == index)
+
+    def parity_name(self, group, row):
+        return self.manifest['parity']['groups'][group]['parity'][row]['name']
+
+    def corrupt(self, name):
+        with open(self.path(name), 'r+b') as f_part:
+            first = f_part.read(1)
+            f_part.seek(0)
+            f_part.write(bytes([first[0] ^ 0xff]))
+
+    def assert_repaired(self):
+        self.assertTrue(main.repair_parts(self.parts_folder, self.manifest))
+        output = os.path.join(self.workdir, 'joined.bin')
+        main.join_files(self.parts_folder, output, cleanup=False, raise_errors=True)
+        with open(output, 'rb') as f_in:
+            self.assertEqual(f_in.read(), self.data)
+
+    def test_rebuilds_k_missing_parts(self):
+        self.split(os.urandom(200000), 6, 3)
+        for index in (1, 4, 6):
+            os.remove(self.path(self.part_name(index)))
+        self.assert_repaired()
+
+    def test_rebuilds_corrupted_parts_with_lost_parity_part(self):
+        self.split(os.urandom(200003), 6, 3)
+        self.corrupt(self.part_name(2))
+        self.corrupt(self.part_name(5))
+        os.remove(self.path(self.parity_name(0, 0)))
+        self.assert_repaired()
+
+    def test_rebuilds_compressed_parts(self):
+        rng = random.Random(7)
+        data = b''.join(bytes([rng.randrange(4)]) * rng.randrange(1, 64) for _ in range(20000))
+        self.split(data, 5, 2, compression='zlib')
+        lengths = {p['stored_length'] for p in self.manifest['parts']}
+        self.assertGreater(len(lengths), 1)
+        os.remove(self.path(self.part_name(1)))
+        self.corrupt(self.part_name(3))
+        self.assert_repaired()
+
+    def test_rebuilds_parts_in_several_groups(self):
+        self.split(os.urandom(130 * 1000 + 17), 130, main.PARITY_MAX_K)
+        groups = self.manifest['parity']['groups']
+        self.assertEqual(len(groups), 2)
+        for index in (groups[0]['parts'][0], groups[0]['parts'][-1], groups[1]['parts'][3], groups[1]['parts'][-1]):
+            os.remove(self.path(self.part_name(index)))
+        os.remove(self.path(self.parity_name(1, 0)))
+        self.assert_repaired()
+
+    def test_refuses_more_than_k_losses(self):
+        self.split(os.urandom(100000), 6, 2)
+        for index in (1, 2, 3):
+            os.remove(self.path(self.part_name(index)))
+        self.assertFalse(main.repair_parts(self.parts_folder, self.manifest))
+        self.assertFalse(any(name.endswith('.tmp') for name in os.listdir(self.parts_folder)))
+        with self.assertRaises(main.SplitterError):
+            main.join_files(self.parts_folder, os.path.join(self.workdir, 'joined.bin'), cleanup=False,
+                            raise_errors=True)
+
+    def test_refuses_when_parity_parts_are_lost_too(self):
+        self.split(os.urandom(100000), 6, 2)
+        os.remove(self.path(self.part_name(2)))
+        os.remove(self.path(self.parity_name(0, 0)))
+        self.corrupt(self.parity_name(0, 1))
+        self.assertFalse(main.repair_parts(self.parts_folder, self.manifest))
+
+if __name__ == '__main__':
+    unittest.main()
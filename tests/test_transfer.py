@@ -0,0 +1,130 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import contextlib
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+import main
+import object_store
+
+main.set_quiet()
+
+class TransferTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='db-divider-test-')
+        self.store = os.path.join(self.workdir, 'store')
+        self.server = object_store.make_server(self.store)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/backups/set1"
+        self.source = os.path.join(self.workdir, 'source.bin')
+        self.data = os.urandom(3 * 1024 * 1024 + 4321)
+        with open(self.source, 'wb') as f_out:
+            f_out.write(self.data)
+        self.quiet = contextlib.redirect_stdout(open(os.devnull, 'w'))
+        self.quiet.__enter__()
+
+    def tearDown(self):
+        self.quiet.__exit__(None, None, None)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def split_and_upload(self, **kwargs):
+        parts_folder = main.split_file(self.source, '5', raise_errors=True, **kwargs)
+        main.upload_parts(parts_folder, self.url, raise_errors=True)
+        self.manifest = main.load_manifest(parts_folder)
+        return parts_folder
+
+    def download_and_join(self):
+        downloaded = os.path.join(self.workdir, 'downloaded_parts')
+        self.assertEqual(main.download_parts(self.url, downloaded, raise_errors=True), downloaded)
+        output = os.path.join(self.workdir, 'joined.bin')
+        main.join_files(downloaded, output, cleanup=False, raise_errors=True)
+        with open(output, 'rb') as f_in:
+            self.assertEqual(f_in.read(), self.data)
+        return downloaded
+
+    def stored(self, name):
+        return os.path.join(self.store, 'backups', 'set1', name)
+
+    def test_round_trip(self):
+        self.split_and_upload()
+        for part in self.manifest['parts']:
+            self.assertEqual(os.path.getsize(self.stored(part['name'])), part['length'])
+        self.assertTrue(os.path.exists(self.stored(main.MANIFEST_NAME)))
+        self.download_and_join()
+        # Все запросы идут через несколько постоянных соединений, а не по одному на файл.
+        self.assertLess(self.server.stats['connections'], self.server.stats['requests'])
+
+    def test_round_trip_with_compression_and_parity(self):
+        self.split_and_upload(compression='zlib', parity=2)
+        downloaded = self.download_and_join()
+        for group in self.manifest['parity']['groups']:
+            for item in group['parity']:
+                self.assertTrue(os.path.exists(os.path.join(downloaded, item['name'])))
+
+    def test_upload_checksum_is_verified_by_server(self):
+        parts_folder = main.split_file(self.source, '5', raise_errors=True)
+        manifest = main.load_manifest(parts_folder)
+        with open(os.path.join(parts_folder, manifest['parts'][0]['name']), 'r+b') as f_part:
+            f_part.write(b'\0' * 16)
+        with self.assertRaises(main.SplitterError):
+            main.upload_parts(parts_folder, self.url, retries=0, raise_errors=True)
+        self.assertFalse(os.path.exists(self.stored(manifest['parts'][0]['name'])))
+        self.assertFalse(os.path.exists(self.stored(main.MANIFEST_NAME)))
+
+    def test_download_rejects_corrupted_part(self):
+        self.split_and_upload()
+        name = self.manifest['parts'][2]['name']
+        with open(self.stored(name), 'r+b') as f_part:
+            f_part.write(b'\0' * 16)
+        downloaded = os.path.join(self.workdir, 'downloaded_parts')
+        with self.assertRaises(main.SplitterError):
+            main.download_parts(self.url, downloaded, retries=0, raise_errors=True)
+        self.assertFalse(os.path.exists(os.path.join(downloaded, name)))
+        self.assertFalse(os.path.exists(os.path.join(downloaded, name + '.tmp')))
+
+    def test_download_resumes_and_skips_finished_parts(self):
+        self.split_and_upload()
+        downloaded = self.download_and_join()
+        os.remove(os.path.join(downloaded, self.manifest['parts'][1]['name']))
+        requests = self.server.stats['requests']
+        self.assertEqual(main.download_parts(self.url, downloaded, raise_errors=True), downloaded)
+        # Манифест, недостающая часть и два необязательных файла.
+        self.assertEqual(self.server.stats['requests'] - requests, 4)
+
+    def test_retries_failed_requests(self):
+        self.server.fail_rate = 0.3
+        with mock.patch.object(main, 'TRANSFER_BACKOFF', 0):
+            parts_folder = main.split_file(self.source, '5', raise_errors=True)
+            main.upload_parts(parts_folder, self.url, retries=20, raise_errors=True)
+            downloaded = os.path.join(self.workdir, 'downloaded_parts')
+            main.download_parts(self.url, downloaded, retries=20, raise_errors=True)
+        self.server.fail_rate = 0
+        output = os.path.join(self.workdir, 'joined.bin')
+        main.join_files(downloaded, output, cleanup=False, raise_errors=True)
+        with open(output, 'rb') as f_in:
+            self.assertEqual(f_in.read(), self.data)
+
+    def test_rejects_unsafe_manifest_names(self):
+        parts_folder = self.split_and_upload()
+        manifest_path = os.path.join(parts_folder, main.MANIFEST_NAME)
+        with open(manifest_path, 'r', encoding='utf-8') as f_manifest:
+            text = f_manifest.read()
+        with open(self.stored(main.MANIFEST_NAME), 'w', encoding='utf-8') as f_manifest:
+            f_manifest.write(text.replace(self.manifest['parts'][0]['name'], '../escaped.bin'))
+        downloaded = os.path.join(self.workdir, 'downloaded_parts')
+        with self.assertRaises(ValueError):
+            main.download_parts(self.url, downloaded, raise_errors=True)
+        self.assertFalse(os.path.exists(downloaded))
+        self.assertFalse(os.path.exists(os.path.join(self.workdir, 'escaped.bin')))
+
+if __name__ == '__main__':
+    unittest.main()